@@ -61,7 +61,11 @@ describe('api', () => {
         },
       ];
       fetchMock.mockOnce(async () => {
-        return makeJsonResponse(expected);
+        return makeJsonResponse({
+          next: null,
+          previous: null,
+          results: expected,
+        });
       });
       const rv = await server.listEmployees();
 
@@ -71,6 +75,30 @@ describe('api', () => {
       expect(rv).toEqual(expected);
     });
 
+    it('listEmployees follows next page', async () => {
+      const server = await getSession();
+      fetchMock.mockOnce(async () => {
+        return makeJsonResponse({
+          next: 'http://localhost/api/v1/employees/?cursor=abc',
+          previous: null,
+          results: [{ id: 1 }],
+        });
+      });
+      fetchMock.mockOnce(async () => {
+        return makeJsonResponse({
+          next: null,
+          previous: 'http://localhost/api/v1/employees/?cursor=def',
+          results: [{ id: 2 }],
+        });
+      });
+      const rv = await server.listEmployees();
+
+      expect(fetchMock).toHaveBeenCalledTimes(3);
+      const request = fetchMock.mock.calls[2][0] as Request;
+      expect(request.url).toEqual('http://localhost/api/v1/employees/?cursor=abc');
+      expect(rv).toEqual([{ id: 1 }, { id: 2 }]);
+    });
+
     it('updateEmployee', async () => {
       const server = await getSession();
       const expected = {
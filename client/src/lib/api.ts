@@ -44,12 +44,7 @@ export class Server {
   }
 
   async listEmployees () {
-    const r = await this._get('/api/v1/employees/');
-    if (r.status !== 200) {
-      throw new Error(r.statusText);
-    }
-    const rv: EmployeeResponse[] = await r.json();
-    return rv;
+    return await this._getAllPages<EmployeeResponse>('/api/v1/employees/');
   }
 
   async updateEmployee (id: number, email: string) {
@@ -83,14 +78,9 @@ export class Server {
   }
 
   async listReviews (userID: number) {
-    const r = await this._get('/api/v1/reviews/', {
+    return await this._getAllPages<ReviewResponse>('/api/v1/reviews/', {
       user: userID,
     });
-    if (r.status !== 200) {
-      throw new Error(r.statusText);
-    }
-    const rv: ReviewResponse[] = await r.json();
-    return rv;
   }
 
   async createReview (userID: number, title: string) {
@@ -117,12 +107,7 @@ export class Server {
   }
 
   async listReviewEmployees (reviewID: number) {
-    const r = await this._get(`/api/v1/reviews/${reviewID}/:employees`);
-    if (r.status !== 200) {
-      throw new Error(r.statusText);
-    }
-    const rv: ReviewEmployeeResponse[] = await r.json();
-    return rv;
+    return await this._getAllPages<ReviewEmployeeResponse>(`/api/v1/reviews/${reviewID}/:employees`);
   }
 
   async inviteReview (reviewID: number, userIDList: number[]) {
@@ -135,12 +120,7 @@ export class Server {
   }
 
   async listFeedbacks () {
-    const r = await this._get(`/api/v1/feedbacks/`);
-    if (r.status !== 200) {
-      throw new Error(r.statusText);
-    }
-    const rv: FeedbackResponse[] = await r.json();
-    return rv;
+    return await this._getAllPages<FeedbackResponse>(`/api/v1/feedbacks/`);
   }
 
   async updateFeedback (feedbackID: number, score: number, memo: string) {
@@ -159,6 +139,24 @@ export class Server {
     return await this._ajax('GET', path, params);
   }
 
+  // list endpoints are paginated by cursor, follow `next` until the end
+  private async _getAllPages<T> (path: string, params?: Record<string, any>) {
+    let r = await this._get(path, params);
+    const rv: T[] = [];
+    while (true) {
+      if (r.status !== 200) {
+        throw new Error(r.statusText);
+      }
+      const page: PageResponse<T> = await r.json();
+      rv.push(...page.results);
+      if (!page.next) {
+        return rv;
+      }
+      const next = new URL(page.next);
+      r = await this._get(`${next.pathname}${next.search}`);
+    }
+  }
+
   private async _post (path: string, params?: Record<string, any>) {
     return await this._ajax('POST', path, params);
   }
@@ -206,6 +204,13 @@ export class Server {
 }
 
 
+interface PageResponse<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+
 interface TokenResponse {
   token: string;
   user: EmployeeResponse;
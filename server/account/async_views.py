@@ -0,0 +1,14 @@
+from server.async_views import as_async_view, authenticate_from_cache, render_json
+
+from .serializers import UserUpdateSerializer
+from .views import EmployeeRetrieveSelfView
+
+
+def _retrieve_self(request, *args, **kwargs):
+    user = authenticate_from_cache(request, EmployeeRetrieveSelfView)
+    if user is None:
+        return None
+    return render_json(UserUpdateSerializer(user).data)
+
+
+employee_self = as_async_view(EmployeeRetrieveSelfView, fast_path=_retrieve_self)
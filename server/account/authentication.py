@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import authentication, exceptions
+
+
+class TokenCache(object):
+    """
+    In-process LRU cache of authenticated (user, token) pairs.
+
+    Controlled by the TOKEN_CACHE_TTL (seconds, 0 disables the cache) and
+    TOKEN_CACHE_MAX_SIZE settings. Entries are dropped by account.signals
+    when the token is deleted or the user changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        ttl = settings.TOKEN_CACHE_TTL
+        if ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        ttl = settings.TOKEN_CACHE_TTL
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_CACHE_MAX_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id: int):
+        self.delete_users([user_id])
+
+    def delete_users(self, user_id_list: list):
+        user_id_set = set(user_id_list)
+        with self._lock:
+            key_list = [
+                key for key, (expires, (user, token)) in self._entries.items()
+                if user.pk in user_id_set
+            ]
+            for key in key_list:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class TokenAuthentication(authentication.TokenAuthentication):
+    """
+    Token authentication which loads the token, the user and its UserExtra
+    in one query, and optionally caches the result in `token_cache`.
+    """
+
+    def authenticate_credentials(self, key):
+        rv = token_cache.get(key)
+        if rv is not None:
+            return rv
+
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user__user_extra').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        rv = (token.user, token)
+        token_cache.set(key, rv)
+        return rv
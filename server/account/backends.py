@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashing import hashing_pool
+
+
+class HashingPoolBackend(ModelBackend):
+    """
+    ModelBackend which checks passwords in account.hashing.hashing_pool.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # hash anyway, so response times do not reveal which users exist
+            hashing_pool.make_password(password)
+            return None
+
+        is_correct, must_update = hashing_pool.check_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = hashing_pool.make_password(password)
+            user.save(update_fields=['password'])
+        return user
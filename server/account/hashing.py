@@ -0,0 +1,211 @@
+"""
+Password hashing in a bounded process pool.
+
+PBKDF2 costs ~100ms of CPU, so a burst of logins would occupy every worker
+thread of the server. With PASSWORD_HASHING_WORKERS > 0 hashing runs in
+that many processes instead. At most PASSWORD_HASHING_QUEUE_SIZE more calls
+wait for a free process; further calls fail fast with 503 rather than pile
+up. With 0 workers hashing runs inline, as Django does by default.
+"""
+
+import collections
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import exceptions, status
+
+
+class HashingUnavailable(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many password checks in progress, try again later.'
+    default_code = 'hashing_unavailable'
+    # seconds, sent as Retry-After
+    wait = 1
+
+
+def _init_worker(settings_module: str):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _call(fn, args):
+    started = time.time()
+    return started, fn(*args)
+
+
+def _make_password(password: str):
+    return hashers.make_password(password)
+
+
+def _make_password_list(password_list: list):
+    return [hashers.make_password(password) for password in password_list]
+
+
+def _check_password(password: str, encoded: str):
+    updated = []
+    is_correct = hashers.check_password(password, encoded, setter=updated.append)
+    # the setter is only called for a correct password with an outdated hash
+    return is_correct, bool(updated)
+
+
+class HashingStats(object):
+    """
+    Counters and recent queue wait times of the pool.
+    """
+
+    def __init__(self, sample_size: int = 1000):
+        self._lock = threading.Lock()
+        self._wait_list = collections.deque(maxlen=sample_size)
+        self.calls = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    def add(self, wait: float):
+        with self._lock:
+            self.calls += 1
+            self._wait_list.append(wait * 1000)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            wait_list = sorted(self._wait_list)
+            rv = {
+                'calls': self.calls,
+                'rejected': self.rejected,
+                'in_flight': self.in_flight,
+            }
+        for name, rate in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            rank = math.ceil(round(rate * len(wait_list), 6))
+            rv[f'wait_{name}_ms'] = wait_list[max(0, rank - 1)] if wait_list else None
+        return rv
+
+    def clear(self):
+        with self._lock:
+            self._wait_list.clear()
+            self.calls = 0
+            self.rejected = 0
+
+
+class HashingPool(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        self._config = None
+        self.stats = HashingStats()
+
+    def make_password(self, password: str) -> str:
+        return self._run(_make_password, password)
+
+    def make_password_list(self, password_list: list, chunk_size: int = 16) -> list:
+        """
+        Hash many passwords in parallel, for bulk imports.
+
+        The batch takes one queue slot, and keeps at most one chunk per
+        worker in flight, so logins still get their turn in between.
+        """
+        executor, slots = self._get_executor()
+        if executor is None:
+            # PBKDF2 releases the GIL, threads keep every core busy
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as thread_pool:
+                return list(thread_pool.map(hashers.make_password, password_list))
+
+        if not slots.acquire(blocking=False):
+            self.stats.reject()
+            raise HashingUnavailable()
+        self.stats.enter()
+        try:
+            rv = []
+            future_list = collections.deque()
+            workers = settings.PASSWORD_HASHING_WORKERS
+            for offset in range(0, len(password_list), chunk_size):
+                if len(future_list) >= workers:
+                    rv.extend(self._wait(future_list.popleft()))
+                chunk = password_list[offset:offset + chunk_size]
+                future_list.append((time.time(), executor.submit(_call, _make_password_list, (chunk,))))
+            while future_list:
+                rv.extend(self._wait(future_list.popleft()))
+            return rv
+        finally:
+            self.stats.leave()
+            slots.release()
+
+    def check_password(self, password: str, encoded: str):
+        """
+        Returns (is_correct, must_update) like django.contrib.auth.hashers
+        does with its setter.
+        """
+        return self._run(_check_password, password, encoded)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._executor = None
+            self._config = None
+
+    def _run(self, fn, *args):
+        executor, slots = self._get_executor()
+        if executor is None:
+            self.stats.add(0)
+            return fn(*args)
+
+        if not slots.acquire(blocking=False):
+            self.stats.reject()
+            raise HashingUnavailable()
+        self.stats.enter()
+        try:
+            return self._wait((time.time(), executor.submit(_call, fn, args)))
+        finally:
+            self.stats.leave()
+            slots.release()
+
+    def _wait(self, submission):
+        submitted, future = submission
+        started, rv = future.result()
+        self.stats.add(max(0, started - submitted))
+        return rv
+
+    def _get_executor(self):
+        config = (settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE_SIZE)
+        with self._lock:
+            if config != self._config:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                workers, queue_size = config
+                if workers > 0:
+                    # spawned, forking a threaded server is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'server.settings'),),
+                    )
+                    self._slots = threading.BoundedSemaphore(workers + queue_size)
+                else:
+                    self._executor = None
+                    self._slots = None
+                self._config = config
+            return self._executor, self._slots
+
+
+hashing_pool = HashingPool()
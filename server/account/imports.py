@@ -0,0 +1,183 @@
+"""
+Bulk import of employees from CSV or NDJSON streams.
+
+Rows are read one at a time and processed in chunks. Each chunk costs one
+query to find taken usernames, a parallel hashing pass and bulk INSERTs of
+User and UserExtra, in a transaction of its own.
+"""
+
+import codecs
+import csv
+import itertools
+import json
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+
+from .hashing import hashing_pool
+from .models import UserExtra
+
+
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+MEDIA_TYPE_DICT = {
+    'text/csv': FORMAT_CSV,
+    'application/x-ndjson': FORMAT_NDJSON,
+}
+
+
+class StreamError(ValueError):
+    """
+    The stream can not be read past `line_number`, e.g. invalid UTF-8 in a
+    CSV. Rows of earlier chunks are already imported, see `report`.
+    """
+
+    def __init__(self, line_number: int, message: str):
+        super().__init__(f'Line {line_number}: {message}')
+        self.line_number = line_number
+        # set by import_employees
+        self.report = None
+
+
+def read_rows(stream, format_: str):
+    """
+    Yield (line number, row) pairs from a binary stream. The row is None
+    when the line can not be parsed. Raises StreamError when a CSV can not be
+    read any further, a NDJSON line is parsed on its own.
+    """
+    if format_ == FORMAT_CSV:
+        reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8'))
+        try:
+            for row in reader:
+                yield reader.line_num, row
+        # both are raised before the failing line is counted
+        except UnicodeDecodeError:
+            raise StreamError(reader.line_num + 1, 'Not valid UTF-8.')
+        except csv.Error as e:
+            raise StreamError(reader.line_num + 1, f'Not valid CSV, {e}.')
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row
+
+
+def import_employees(row_iter, chunk_size: int):
+    """
+    Create employees from (line number, row) pairs of read_rows.
+
+    Returns a report like {"created": 2, "failed": 1, "errors": [{"line": 3,
+    "username": "alice", "errors": {"username": ["..."]}}]}.
+    StreamError of read_rows is raised with the report so far.
+    """
+    report = {
+        'created': 0,
+        'failed': 0,
+        'errors': [],
+    }
+    # usernames taken by earlier rows of the upload
+    seen = set()
+    row_iter = iter(row_iter)
+    while True:
+        try:
+            chunk = list(itertools.islice(row_iter, chunk_size))
+        except StreamError as e:
+            # the rows of this chunk are dropped, earlier chunks are kept
+            e.report = report
+            raise
+        if not chunk:
+            break
+        _import_chunk(chunk, seen, report)
+    return report
+
+
+def _import_chunk(chunk: list, seen: set, report: dict):
+    row_dict = {}
+    for line_number, row in chunk:
+        username, errors = _clean(row)
+        if not errors and username in seen:
+            errors = {'username': ['Duplicated in the upload.']}
+        if errors:
+            _add_error(report, line_number, username, errors)
+            continue
+        seen.add(username)
+        row_dict[username] = (line_number, row)
+
+    # somebody may create the same users in the meantime, retry once
+    for _ in range(2):
+        taken = set(User.objects
+            .filter(username__in=list(row_dict.keys()))
+            .values_list('username', flat=True)
+        )
+        for username in taken:
+            line_number, row = row_dict.pop(username)
+            _add_error(report, line_number, username, {
+                'username': ['A user with that username already exists.'],
+            })
+        if not row_dict:
+            return
+
+        password_list = hashing_pool.make_password_list(
+            [row['password'] for line_number, row in row_dict.values()],
+        )
+        user_list = [
+            User(username=username, email=row.get('email') or '', password=encoded)
+            for (username, (line_number, row)), encoded in zip(row_dict.items(), password_list)
+        ]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(user_list)
+                if not connection.features.can_return_rows_from_bulk_insert:
+                    id_dict = dict(User.objects
+                        .filter(username__in=list(row_dict.keys()))
+                        .values_list('username', 'pk')
+                    )
+                    for user in user_list:
+                        user.pk = id_dict[user.username]
+                UserExtra.objects.bulk_create(
+                    UserExtra(user_id=user.pk, is_admin=False) for user in user_list
+                )
+        except IntegrityError:
+            continue
+        report['created'] += len(user_list)
+        return
+
+    for username, (line_number, row) in row_dict.items():
+        _add_error(report, line_number, username, {
+            'username': ['A user with that username already exists.'],
+        })
+
+
+def _clean(row):
+    """
+    Returns (username, errors) of a row, errors is None when it is valid.
+    """
+    if not isinstance(row, dict):
+        return None, {'row': ['Not a valid row.']}
+    errors = {}
+    username = User.normalize_username(str(row.get('username') or ''))
+    for name, value in (('username', username), ('email', row.get('email') or '')):
+        try:
+            User._meta.get_field(name).clean(value, None)
+        except ValidationError as e:
+            errors[name] = e.messages
+    password = row.get('password')
+    if not password or not isinstance(password, str):
+        errors['password'] = ['This field is required.']
+    return username, errors or None
+
+
+def _add_error(report: dict, line_number: int, username, errors: dict):
+    report['failed'] += 1
+    report['errors'].append({
+        'line': line_number,
+        'username': username,
+        'errors': errors,
+    })
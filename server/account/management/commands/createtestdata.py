@@ -1,12 +1,39 @@
-from django.core.management.base import BaseCommand
+import random
 
-from account.models import create_user
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from account.models import UserExtra, create_user
+from review.models import Review, ReviewRequest, ReviewResponse
 
 
 class Command(BaseCommand):
-    help = 'Create default set of users for testing'
+    help = 'Create default set of users for testing, or a large synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=None,
+            help='generate this many employees with bulk inserts')
+        parser.add_argument('--reviews', type=int, default=0)
+        parser.add_argument('--requests-per-review', type=int, default=0)
+        parser.add_argument('--response-rate', type=float, default=0.5,
+            help='probability of a review request being answered')
+        parser.add_argument('--seed', type=int, default=0,
+            help='random seed, the same seed generates the same data')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+            help='rows per INSERT/transaction')
+        parser.add_argument('--password', default='1234',
+            help='password of every generated user')
 
     def handle(self, *args, **kwargs):
+        if kwargs['users'] is None:
+            self._create_default_users()
+            return
+        self._generate(**kwargs)
+
+    def _create_default_users(self):
         # create admin account
         user = create_user(is_admin=True, username=f'admin', password='1234')
         self.stdout.write(f'Created {user.username}')
@@ -14,3 +41,89 @@ class Command(BaseCommand):
         for i in range(10):
             user = create_user(is_admin=False, username=f'user{i}', password='1234')
             self.stdout.write(f'Created {user.username}')
+
+    def _generate(self, users, reviews, requests_per_review, response_rate, seed, chunk_size, password, **kwargs):
+        if min(users, reviews, requests_per_review) < 0:
+            raise CommandError('--users, --reviews and --requests-per-review can not be negative')
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive')
+        if not 0 <= response_rate <= 1:
+            raise CommandError('--response-rate must be between 0 and 1')
+        if reviews and not users:
+            raise CommandError('--reviews needs --users, reviews are owned by generated users')
+
+        rng = random.Random(seed)
+        if not User.objects.filter(username='admin').exists():
+            create_user(is_admin=True, username='admin', password=password)
+            self.stdout.write('Created admin')
+
+        # hash once, every generated user shares the same password
+        encoded = make_password(password)
+        base_user_id = self._next_id(User)
+        for offset in range(0, users, chunk_size):
+            size = min(chunk_size, users - offset)
+            id_list = range(base_user_id + offset, base_user_id + offset + size)
+            with transaction.atomic():
+                User.objects.bulk_create(
+                    User(pk=pk, username=f'user{pk}', password=encoded) for pk in id_list
+                )
+                UserExtra.objects.bulk_create(
+                    UserExtra(user_id=pk, is_admin=False) for pk in id_list
+                )
+            self.stdout.write(f'Created {offset + size}/{users} users')
+        user_id_range = range(base_user_id, base_user_id + users)
+
+        requests_per_review = min(requests_per_review, users - 1)
+        reviews_per_chunk = max(1, chunk_size // max(1, requests_per_review))
+        next_review_id = self._next_id(Review)
+        next_request_id = self._next_id(ReviewRequest)
+        for offset in range(0, reviews, reviews_per_chunk):
+            size = min(reviews_per_chunk, reviews - offset)
+            review_list = []
+            request_list = []
+            response_list = []
+            for i in range(size):
+                review = Review(
+                    pk=next_review_id,
+                    owner_id=rng.choice(user_id_range),
+                    title=f'Review {offset + i}',
+                )
+                next_review_id += 1
+                # one extra participant in case the owner is picked
+                for owner_id in rng.sample(user_id_range, min(users, requests_per_review + 1)):
+                    if owner_id == review.owner_id:
+                        continue
+                    if review.request_count >= requests_per_review:
+                        break
+                    request_list.append(ReviewRequest(
+                        pk=next_request_id,
+                        review_id=review.pk,
+                        owner_id=owner_id,
+                    ))
+                    review.request_count += 1
+                    if rng.random() < response_rate:
+                        score = rng.randint(0, 100)
+                        response_list.append(ReviewResponse(
+                            request_id=next_request_id,
+                            score=score,
+                            memo='',
+                        ))
+                        review.response_count += 1
+                        review.score_sum += score
+                    next_request_id += 1
+                review_list.append(review)
+            with transaction.atomic():
+                Review.objects.bulk_create(review_list, batch_size=chunk_size)
+                ReviewRequest.objects.bulk_create(request_list, batch_size=chunk_size)
+                ReviewResponse.objects.bulk_create(response_list, batch_size=chunk_size)
+            self.stdout.write(f'Created {offset + size}/{reviews} reviews')
+
+        # explicit primary keys do not advance sequences on some backends
+        model_list = [User, UserExtra, Review, ReviewRequest, ReviewResponse]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), model_list):
+                cursor.execute(sql)
+
+    def _next_id(self, model):
+        last_id = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+        return (last_id or 0) + 1
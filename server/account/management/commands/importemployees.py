@@ -0,0 +1,38 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from account.imports import FORMAT_CSV, FORMAT_NDJSON, StreamError, import_employees, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Create employees from a CSV or NDJSON file with username, password and email'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str,
+            help='file to import')
+        parser.add_argument('--format', choices=[FORMAT_CSV, FORMAT_NDJSON],
+            help='file format, default to the file extension')
+        parser.add_argument('--chunk-size', type=int,
+            default=settings.EMPLOYEE_IMPORT_CHUNK_SIZE,
+            help='rows per transaction')
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['path']
+        format_ = kwargs['format']
+        if format_ is None:
+            format_ = FORMAT_NDJSON if path.endswith(('.ndjson', '.jsonl')) else FORMAT_CSV
+        try:
+            with open(path, 'rb') as stream:
+                report = import_employees(read_rows(stream, format_), kwargs['chunk_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+        except StreamError as e:
+            for error in e.report['errors']:
+                self.stderr.write(json.dumps(error))
+            raise CommandError(f'{e} Created {e.report["created"]} employees before')
+
+        for error in report['errors']:
+            self.stderr.write(json.dumps(error))
+        self.stdout.write(f'Created {report["created"]} employees, {report["failed"]} failed')
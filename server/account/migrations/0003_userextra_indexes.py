@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_userextra_is_active'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userextra',
+            index=models.Index(fields=['is_admin', 'is_active'], name='userextra_admin_active_idx'),
+        ),
+    ]
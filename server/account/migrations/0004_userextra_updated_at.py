@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_userextra_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userextra',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
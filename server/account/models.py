@@ -1,21 +1,78 @@
 from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.dispatch import Signal
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .hashing import hashing_pool
+
+
+# sent by deactivate_employees inside its transaction, with `user_id_list`
+# and `cancel_pending`. Receivers return the number of items they cancelled
+employees_deactivated = Signal()
 
 
 class UserExtra(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='user_extra')
     is_admin = models.BooleanField(null=False)
     is_active = models.BooleanField(null=False, default=True)
+    # also touched when the user changes, see account.signals
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_admin', 'is_active'], name='userextra_admin_active_idx'),
+        ]
 
 
-@transaction.atomic
 def create_user(
     is_admin: bool,
     username: str,
     password: str,
 ):
-    user: User = User.objects.create_user(username=username, password=password)
-    user.save()
-    extra = UserExtra(user=user, is_admin=is_admin)
-    extra.save()
+    # hash outside of the transaction, it may wait for the pool
+    encoded = hashing_pool.make_password(password)
+    with transaction.atomic():
+        user = User(username=User.normalize_username(username), password=encoded)
+        user.save()
+        extra = UserExtra(user=user, is_admin=is_admin)
+        extra.save()
     return user
+
+
+def deactivate_employees(user_id_list: list, cancel_pending: bool = False):
+    """
+    Deactivate many employees at once, and log them out.
+
+    Their UserExtra rows are flipped with one UPDATE and their tokens are
+    deleted in bulk. Receivers of `employees_deactivated` clean up the rest,
+    e.g. review.signals cancels pending review requests if `cancel_pending`.
+
+    Returns (deactivated user ids, number of cancelled items). Admins and
+    users which are already inactive are left untouched.
+    """
+    with transaction.atomic():
+        queryset = UserExtra.objects.filter(
+            user_id__in=user_id_list,
+            is_admin=False,
+            is_active=True,
+        )
+        deactivated = list(queryset.select_for_update().values_list('user_id', flat=True))
+        if not deactivated:
+            return [], 0
+        UserExtra.objects.filter(user_id__in=deactivated).update(
+            is_active=False,
+            updated_at=timezone.now(),
+        )
+        Token.objects.filter(user_id__in=deactivated).delete()
+        response_list = employees_deactivated.send(
+            sender=UserExtra,
+            user_id_list=deactivated,
+            cancel_pending=cancel_pending,
+        )
+        # the UPDATE does not send signals, drop the cached users here, after
+        # the commit so a concurrent request can not cache them as active
+        transaction.on_commit(lambda: token_cache.delete_users(deactivated))
+    cancelled = sum(rv for receiver, rv in response_list if rv)
+    return deactivated, cancelled
@@ -2,6 +2,7 @@ from django.contrib.auth.models import User
 from rest_framework import serializers
 
 from account.models import create_user
+from server.values import ValuesMapping
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -34,3 +35,21 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'is_admin']
         read_only_fields = ['username', 'is_admin']
+
+
+# what UserUpdateSerializer renders, for ValuesListMixin
+user_values = ValuesMapping({
+    'id': 'id',
+    'username': 'username',
+    'email': 'email',
+    'is_admin': 'user_extra__is_admin',
+})
+
+
+class EmployeeDeactivateSerializer(serializers.Serializer):
+    employees = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+    )
+    # also cancel the review requests they have not answered yet
+    cancel_pending_requests = serializers.BooleanField(default=False)
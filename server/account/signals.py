@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import UserExtra
+
+
+@receiver(post_delete, sender=Token)
+def on_token_deleted(sender, instance: Token, **kwargs):
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def on_user_changed(sender, instance: User, **kwargs):
+    token_cache.delete_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def on_user_saved(sender, instance: User, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    # User has no timestamp of its own, employee ETags follow UserExtra
+    UserExtra.objects.filter(user_id=instance.pk).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=UserExtra)
+@receiver(post_delete, sender=UserExtra)
+def on_user_extra_changed(sender, instance: UserExtra, **kwargs):
+    token_cache.delete_user(instance.user_id)
@@ -1,7 +1,22 @@
+import csv
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+
+from review.models import Review, ReviewRequest, ReviewResponse, annotate_review_stats
+from server.testing import async_request
 
+from .authentication import token_cache
+from .hashing import hashing_pool
 from .models import create_user
+from .serializers import UserCreateSerializer
 
 
 def get_auth_header(client: Client, username: str, password: str):
@@ -39,9 +54,33 @@ class TestAccount(TestCase):
         headers = get_auth_header(self.client, username='admin', password='1234')
         response = self.client.get('/api/v1/employees/', **headers)
         self.assertEqual(response.status_code, 200)
-        data = response.json()
+        data = response.json()['results']
         self.assertEqual(len(data), 10)
 
+    def testListEmployeesFromValues(self):
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        response = self.client.get('/api/v1/employees/', **headers)
+        queryset = User.objects.filter(user_extra__is_admin=False).order_by('pk')
+        self.assertEqual(response.json()['results'], UserCreateSerializer(queryset, many=True).data)
+
+    def testListEmployeesPagination(self):
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        id_list = []
+        url = '/api/v1/employees/?page_size=3'
+        while url:
+            response = self.client.get(url, **headers)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), 3)
+            id_list.extend(u['id'] for u in data['results'])
+            url = data['next']
+        self.assertEqual(id_list, list(range(2, 12)))
+
+        with self.settings(MAX_PAGE_SIZE=4):
+            response = self.client.get('/api/v1/employees/?page_size=100', **headers)
+        data = response.json()
+        self.assertEqual(len(data['results']), 4)
+
     def testCreateEmployee(self):
         headers = get_auth_header(self.client, username='admin', password='1234')
         response = self.client.post('/api/v1/employees/', {
@@ -83,3 +122,308 @@ class TestAccount(TestCase):
         self.assertEqual(response.status_code, 200)
         data = response.json()
         self.assertEqual(data['username'], 'admin')
+
+    def testConditionalGetEmployees(self):
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        response = self.client.get('/api/v1/employees/', **headers)
+        etag = response['ETag']
+        response = self.client.get('/api/v1/employees/11/', **headers)
+        last_modified = response['Last-Modified']
+
+        # token + validators
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/employees/', HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/employees/11/',
+                HTTP_IF_MODIFIED_SINCE=last_modified, **headers)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/v1/employees/', {
+            'page_size': 3,
+        }, HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 200)
+
+        # a user change is reflected
+        response = self.client.put('/api/v1/employees/11/', {
+            'email': 'aa@bb.cc',
+        }, content_type='application/json', **headers)
+        response = self.client.get('/api/v1/employees/', HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # so is a deactivation
+        response = self.client.delete('/api/v1/employees/11/', **headers)
+        response = self.client.get('/api/v1/employees/', HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 9)
+
+    def testTokenAuthenticationQueries(self):
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        # token, user and user_extra in one query
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/employees/:self', **headers)
+        self.assertEqual(response.status_code, 200)
+
+    def testTokenCache(self):
+        admin_headers = get_auth_header(self.client, username='admin', password='1234')
+        headers = get_auth_header(self.client, username='user0', password='1234')
+        self.addCleanup(token_cache.clear)
+        with self.settings(TOKEN_CACHE_TTL=60):
+            response = self.client.get('/api/v1/employees/:self', **headers)
+            self.assertEqual(response.status_code, 200)
+            with self.assertNumQueries(0):
+                response = self.client.get('/api/v1/employees/:self', **headers)
+            self.assertEqual(response.status_code, 200)
+
+            # deactivation must not be hidden by the cache
+            response = self.client.delete('/api/v1/employees/2/', **admin_headers)
+            self.assertEqual(response.status_code, 204)
+            # the token is revoked as well
+            response = self.client.get('/api/v1/employees/:self', **headers)
+            self.assertEqual(response.status_code, 401)
+
+    def testRetriveSelfAsync(self):
+        headers = get_auth_header(self.client, username='user0', password='1234')
+        self.addCleanup(token_cache.clear)
+        get = lambda path, **extra: async_request(self.async_client, 'get', path, **extra)
+        with self.settings(ROOT_URLCONF='server.urls_async'):
+            # token
+            with self.assertNumQueries(1):
+                response = get('/api/v1/employees/:self', **headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['username'], 'user0')
+
+            # served from the token cache on the event loop
+            with self.settings(TOKEN_CACHE_TTL=60):
+                get('/api/v1/employees/:self', **headers)
+                with self.assertNumQueries(0):
+                    response = get('/api/v1/employees/:self', **headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['username'], 'user0')
+
+            response = get('/api/v1/employees/:self')
+            self.assertEqual(response.status_code, 401)
+
+    def testHashingPool(self):
+        self.addCleanup(hashing_pool.shutdown)
+        with self.settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE_SIZE=0):
+            hashing_pool.stats.clear()
+            headers = get_auth_header(self.client, username='admin', password='1234')
+            response = self.client.post('/api/v1/employees/', {
+                'username': 'vanilla',
+                'password': '5678',
+            }, **headers)
+            self.assertEqual(response.status_code, 201)
+            response = self.client.post('/api/v1/tokens/', {
+                'username': 'vanilla',
+                'password': '5678',
+            })
+            self.assertEqual(response.status_code, 200)
+            response = self.client.post('/api/v1/tokens/', {
+                'username': 'vanilla',
+                'password': '1234',
+            })
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.get('/api/v1/stats/hashing/', **headers)
+            data = response.json()
+            self.assertEqual(data['calls'], 4)
+            self.assertEqual(data['rejected'], 0)
+            self.assertIsNotNone(data['wait_p99_ms'])
+
+            # the only worker is busy and nothing may queue
+            thread = threading.Thread(target=hashing_pool._run, args=(time.sleep, 1))
+            thread.start()
+            while hashing_pool.stats.in_flight == 0:
+                time.sleep(0.01)
+            response = self.client.post('/api/v1/tokens/', {
+                'username': 'vanilla',
+                'password': '5678',
+            })
+            thread.join()
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '1')
+            self.assertEqual(hashing_pool.stats.snapshot()['rejected'], 1)
+
+    def testDeactivateEmployees(self):
+        admin_headers = get_auth_header(self.client, username='admin', password='1234')
+        headers = get_auth_header(self.client, username='user0', password='1234')
+        self.addCleanup(token_cache.clear)
+        with self.settings(TOKEN_CACHE_TTL=60):
+            response = self.client.get('/api/v1/employees/:self', **headers)
+            self.assertEqual(response.status_code, 200)
+
+            # user0, user1, admin, a missing id and a duplicate
+            with self.assertNumQueries(7), self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/v1/employees/:deactivate', {
+                    'employees': [2, 3, 1, 999, 2],
+                }, content_type='application/json', **admin_headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {
+                'deactivated': [2, 3],
+                'not_found': [1, 999],
+                'cancelled_requests': 0,
+            })
+            self.assertFalse(User.objects.get(pk=2).user_extra.is_active)
+            self.assertTrue(User.objects.get(pk=4).user_extra.is_active)
+            self.assertFalse(Token.objects.filter(user_id__in=[2, 3]).exists())
+            response = self.client.get('/api/v1/employees/:self', **headers)
+            self.assertEqual(response.status_code, 401)
+
+        response = self.client.post('/api/v1/employees/:deactivate', {
+            'employees': [],
+        }, content_type='application/json', **admin_headers)
+        self.assertEqual(response.status_code, 400)
+
+    def testImportEmployees(self):
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        body = '\n'.join([
+            'username,password,email',
+            'alice,5678,alice@example.com',
+            'user0,5678,',
+            'bob,,bob@example.com',
+            'carol,5678,not-an-email',
+            'alice,5678,',
+            'dave,5678,',
+        ])
+        with self.settings(EMPLOYEE_IMPORT_CHUNK_SIZE=2):
+            response = self.client.post('/api/v1/employees/:import', body,
+                content_type='text/csv', **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['created'], 2)
+        self.assertEqual(data['failed'], 4)
+        self.assertEqual([(_['line'], list(_['errors'])) for _ in data['errors']], [
+            (3, ['username']),
+            (4, ['password']),
+            (5, ['email']),
+            (6, ['username']),
+        ])
+        user = User.objects.get(username='alice')
+        self.assertEqual(user.email, 'alice@example.com')
+        self.assertTrue(user.check_password('5678'))
+        self.assertFalse(user.user_extra.is_admin)
+        self.assertTrue(User.objects.get(username='dave').user_extra.is_active)
+
+        body = '{"username": "erin", "password": "5678"}\n{"username"\n'
+        response = self.client.post('/api/v1/employees/:import', body,
+            content_type='application/x-ndjson', **headers)
+        data = response.json()
+        self.assertEqual(data['created'], 1)
+        self.assertEqual(data['errors'], [{
+            'line': 2,
+            'username': None,
+            'errors': {'row': ['Not a valid row.']},
+        }])
+
+        response = self.client.post('/api/v1/employees/:import', {},
+            content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 415)
+
+        headers = get_auth_header(self.client, username='user0', password='1234')
+        response = self.client.post('/api/v1/employees/:import', body,
+            content_type='application/x-ndjson', **headers)
+        self.assertEqual(response.status_code, 403)
+
+    def testImportEmployeesBadStream(self):
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        body = b'\n'.join([
+            b'username,password,email',
+            b'alice,5678,',
+            b'bob,5678,',
+            b'carol\xff,5678,',
+        ])
+        with self.settings(EMPLOYEE_IMPORT_CHUNK_SIZE=1):
+            response = self.client.post('/api/v1/employees/:import', body,
+                content_type='text/csv', **headers)
+        self.assertEqual(response.status_code, 400)
+        data = response.json()
+        self.assertEqual(data['line'], 4)
+        self.assertEqual(data['detail'], 'Line 4: Not valid UTF-8.')
+        self.assertEqual(data['created'], 2)
+
+        body = b'username,password,email\ndave,5678,' + b'x' * (csv.field_size_limit() + 1) + b'\n'
+        response = self.client.post('/api/v1/employees/:import', body,
+            content_type='text/csv', **headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['line'], 2)
+        self.assertFalse(User.objects.filter(username='dave').exists())
+
+        # a NDJSON line is parsed on its own
+        body = b'{"username": "erin\xff", "password": "5678"}\n{"username": "erin", "password": "5678"}\n'
+        response = self.client.post('/api/v1/employees/:import', body,
+            content_type='application/x-ndjson', **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['created'], 1)
+        self.assertEqual(data['errors'][0]['line'], 1)
+
+    def testImportEmployeesCommand(self):
+        fd, path = tempfile.mkstemp(suffix='.ndjson')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as fout:
+            fout.write('{"username": "frank", "password": "5678"}\n')
+            fout.write('{"username": "user1", "password": "5678"}\n')
+        stdout = StringIO()
+        call_command('importemployees', path, stdout=stdout, stderr=StringIO())
+        self.assertIn('Created 1 employees, 1 failed', stdout.getvalue())
+        self.assertTrue(User.objects.get(username='frank').check_password('5678'))
+
+        with open(path, 'wb') as fout:
+            fout.write(b'username,password,email\ngrace\xff,5678,\n')
+        with self.assertRaisesMessage(CommandError, 'Line 2: Not valid UTF-8.'):
+            call_command('importemployees', path, format='csv', stdout=StringIO(), stderr=StringIO())
+
+    def testCreateScaledTestData(self):
+        call_command(
+            'createtestdata',
+            users=30,
+            reviews=7,
+            requests_per_review=5,
+            response_rate=0.5,
+            seed=42,
+            chunk_size=8,
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.filter(username__startswith='user').count(), 40)
+        review_list = annotate_review_stats(Review.objects.all())
+        self.assertEqual(len(review_list), 7)
+        for review in review_list:
+            self.assertEqual(review.request_count, 5)
+            self.assertEqual(review.requested, 5)
+            self.assertEqual(review.response_count, review.responsed)
+            self.assertEqual(review.score, review.avg_score or 0)
+        user = User.objects.order_by('-pk').first()
+        self.assertTrue(user.check_password('1234'))
+        self.assertFalse(user.user_extra.is_admin)
+
+    def testCreateScaledTestDataIsReproducible(self):
+        def generate():
+            call_command(
+                'createtestdata',
+                users=20,
+                reviews=5,
+                requests_per_review=4,
+                seed=7,
+                stdout=StringIO(),
+            )
+            return (
+                list(Review.objects.order_by('pk').values_list(
+                    'pk', 'owner', 'title', 'request_count', 'response_count', 'score_sum',
+                )),
+                list(ReviewRequest.objects.order_by('pk').values_list('pk', 'review', 'owner')),
+                list(ReviewResponse.objects.order_by('request').values_list('request', 'score')),
+            )
+
+        base_user_id = User.objects.order_by('-pk').values_list('pk', flat=True).first() + 1
+        first = generate()
+        # the reviews, requests and responses cascade
+        User.objects.filter(pk__gte=base_user_id).delete()
+        self.assertEqual(generate(), first)
+        self.assertEqual(len(first[0]), 5)
+
+    def testCreateScaledTestDataArguments(self):
+        with self.assertRaises(CommandError):
+            call_command('createtestdata', users=0, reviews=3, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('createtestdata', users=10, response_rate=2, stdout=StringIO())
@@ -8,4 +8,7 @@ urlpatterns = [
     path('api/v1/employees/', views.EmployeeListCreateView.as_view()),
     path('api/v1/employees/<int:pk>/', views.EmployeeRetrieveUpdateDestroyView.as_view()),
     path('api/v1/employees/:self', views.EmployeeRetrieveSelfView.as_view()),
+    path('api/v1/employees/:import', views.EmployeeImportView.as_view()),
+    path('api/v1/employees/:deactivate', views.EmployeeDeactivateView.as_view()),
+    path('api/v1/stats/hashing/', views.HashingStatsView.as_view()),
 ]
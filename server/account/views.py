@@ -1,16 +1,30 @@
+from django.conf import settings
 from django.contrib.auth.models import User
 from rest_framework.generics import (
     ListCreateAPIView,
     RetrieveUpdateDestroyAPIView,
     RetrieveAPIView,
 )
+from rest_framework import status
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed, UnsupportedMediaType
+from rest_framework.views import APIView
 
+from server.conditional import ConditionalGetMixin
+from server.values import ValuesListMixin
+
+from .hashing import hashing_pool
+from .models import deactivate_employees
+from .imports import MEDIA_TYPE_DICT, StreamError, import_employees, read_rows
 from .permissions import IsAdmin, IsAuthenticated
-from .serializers import UserCreateSerializer, UserUpdateSerializer
+from .serializers import (
+    EmployeeDeactivateSerializer,
+    UserCreateSerializer,
+    UserUpdateSerializer,
+    user_values,
+)
 
 
 class TokenCreateDestroyView(ObtainAuthToken):
@@ -33,26 +47,28 @@ class TokenCreateDestroyView(ObtainAuthToken):
         })
 
 
-class EmployeeListCreateView(ListCreateAPIView):
+class EmployeeListCreateView(ConditionalGetMixin, ValuesListMixin, ListCreateAPIView):
     permission_classes = [IsAdmin]
     serializer_class = UserCreateSerializer
+    values_mapping = user_values
+    last_modified_field = 'user_extra__updated_at'
     queryset = User.objects.filter(
         user_extra__is_admin=False,
         user_extra__is_active=True,
-    )
+    ).select_related('user_extra')
 
 
-class EmployeeRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
+class EmployeeRetrieveUpdateDestroyView(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAdmin]
     serializer_class = UserUpdateSerializer
+    last_modified_field = 'user_extra__updated_at'
     queryset = User.objects.filter(
         user_extra__is_admin=False,
         user_extra__is_active=True,
-    )
+    ).select_related('user_extra')
 
     def perform_destroy(self, instance: User):
-        instance.user_extra.is_active = False
-        instance.user_extra.save()
+        deactivate_employees([instance.pk])
 
 
 class EmployeeRetrieveSelfView(RetrieveAPIView):
@@ -63,3 +79,74 @@ class EmployeeRetrieveSelfView(RetrieveAPIView):
         instance = request.user
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
+
+
+class EmployeeDeactivateView(APIView):
+    """
+    Deactivate many employees in one transaction.
+
+    Accepts {"employees": [id, ...], "cancel_pending_requests": false} and
+    reports which ids were deactivated and which were not active employees.
+    """
+
+    permission_classes = [IsAdmin]
+
+    def post(self, request, *args, **kwargs):
+        serializer = EmployeeDeactivateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        user_id_list = list(dict.fromkeys(data['employees']))
+        deactivated, cancelled = deactivate_employees(
+            user_id_list,
+            cancel_pending=data['cancel_pending_requests'],
+        )
+        deactivated_set = set(deactivated)
+        return Response({
+            'deactivated': [_ for _ in user_id_list if _ in deactivated_set],
+            'not_found': [_ for _ in user_id_list if _ not in deactivated_set],
+            'cancelled_requests': cancelled,
+        })
+
+
+class HashingStatsView(APIView):
+    """
+    Calls, rejections and queue wait times of the password hashing pool.
+    """
+
+    permission_classes = [IsAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response(hashing_pool.stats.snapshot())
+
+
+class EmployeeImportView(APIView):
+    """
+    Creates employees from a CSV or NDJSON body with username, password and
+    email columns. The body is read line by line, rows which can not be
+    created are reported instead of failing the whole upload. A CSV which can
+    not be read any further is a 400 naming the line, with the report of the
+    rows imported before it.
+    """
+
+    permission_classes = [IsAdmin]
+
+    def post(self, request, *args, **kwargs):
+        media_type = request.content_type.split(';')[0].strip().lower()
+        format_ = MEDIA_TYPE_DICT.get(media_type)
+        if format_ is None:
+            raise UnsupportedMediaType(media_type)
+        # bypass the parsers, the body may be too large to hold in memory
+        stream = request.stream or []
+        try:
+            report = import_employees(
+                read_rows(stream, format_),
+                settings.EMPLOYEE_IMPORT_CHUNK_SIZE,
+            )
+        except StreamError as e:
+            return Response({
+                'detail': str(e),
+                'line': e.line_number,
+                **e.report,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
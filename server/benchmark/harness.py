@@ -0,0 +1,268 @@
+import http.client
+import json
+import math
+import random
+import selectors
+import socket
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+class InProcessTransport(object):
+    """
+    Send requests through django.test.Client in the current thread.
+
+    The database connection is per thread, so the queries of every request
+    can be counted.
+    """
+
+    def __init__(self, host: str = 'localhost'):
+        # server errors are results, not reasons to stop the run
+        self._client = Client(raise_request_exception=False, HTTP_HOST=host)
+
+    def request(self, method: str, path: str, data=None, token: str = None):
+        extra = {}
+        if token:
+            extra['HTTP_AUTHORIZATION'] = f'Token {token}'
+        with CaptureQueriesContext(connection) as context:
+            if method == 'GET':
+                response = self._client.get(path, data, **extra)
+            else:
+                response = self._client.generic(
+                    method,
+                    path,
+                    json.dumps(data) if data is not None else '',
+                    content_type='application/json',
+                    **extra,
+                )
+        return response.status_code, _load_json(response.content), len(context)
+
+    def close(self):
+        connection.close()
+
+
+class HTTPTransport(object):
+    """
+    Send requests to a running server over a keep-alive connection.
+
+    Query counts are not observable from outside, they are reported as None.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        parts = urlsplit(base_url)
+        self._host = parts.hostname
+        self._port = parts.port
+        self._timeout = timeout
+        self._connection = None
+
+    def request(self, method: str, path: str, data=None, token: str = None):
+        headers = {
+            'Accept': 'application/json',
+        }
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        body = None
+        if method == 'GET':
+            if data:
+                path = f'{path}?{urlencode(data)}'
+        elif data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self._ensure_connection()
+            self._connection.request(method, path, body=body, headers=headers)
+            response = self._connection.getresponse()
+            content = response.read()
+        except (http.client.HTTPException, OSError):
+            # drop the broken connection and let the caller see the error
+            self.close()
+            raise
+        return response.status, _load_json(content), None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _ensure_connection(self):
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(
+                self._host,
+                self._port,
+                timeout=self._timeout,
+            )
+
+
+def _load_json(content: bytes):
+    if not content:
+        return None
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
+
+
+def percentile(sorted_list: list, rate: float):
+    if not sorted_list:
+        return None
+    # nearest rank, rounded first to ignore floating point noise
+    rank = math.ceil(round(rate * len(sorted_list), 6))
+    return sorted_list[max(0, min(len(sorted_list), rank) - 1)]
+
+
+class Recorder(object):
+    """
+    Thread-safe collection of (scenario, latency, status, queries) samples.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sample_dict = {}
+
+    def add(self, scenario: str, latency: float, ok: bool, queries):
+        with self._lock:
+            sample_list = self._sample_dict.setdefault(scenario, [])
+            sample_list.append((latency, ok, queries))
+
+    def summary(self, elapsed: float):
+        with self._lock:
+            sample_dict = {k: list(v) for k, v in self._sample_dict.items()}
+        rv = {}
+        all_samples = []
+        for scenario, sample_list in sorted(sample_dict.items()):
+            rv[scenario] = _summarize(sample_list, elapsed)
+            all_samples.extend(sample_list)
+        rv['all'] = _summarize(all_samples, elapsed)
+        return rv
+
+
+def _summarize(sample_list: list, elapsed: float):
+    latency_list = sorted(latency * 1000 for latency, ok, queries in sample_list)
+    query_list = [queries for latency, ok, queries in sample_list if queries is not None]
+    return {
+        'requests': len(sample_list),
+        'errors': sum(1 for latency, ok, queries in sample_list if not ok),
+        'rps': len(sample_list) / elapsed if elapsed > 0 else None,
+        'p50_ms': percentile(latency_list, 0.50),
+        'p95_ms': percentile(latency_list, 0.95),
+        'p99_ms': percentile(latency_list, 0.99),
+        'queries_per_request': sum(query_list) / len(query_list) if query_list else None,
+    }
+
+
+def run_workers(make_transport, worker, concurrency: int, duration: float, recorder: Recorder):
+    """
+    Run `worker(transport, rng, deadline, recorder)` in `concurrency` threads.
+
+    Returns the wall clock time spent.
+    """
+    deadline = time.monotonic() + duration
+    error_list = []
+
+    def main(index: int):
+        transport = make_transport()
+        rng = random.Random(index)
+        try:
+            worker(transport, rng, deadline, recorder)
+        except Exception as e:
+            error_list.append(e)
+        finally:
+            transport.close()
+
+    begin = time.monotonic()
+    thread_list = [
+        threading.Thread(target=main, args=(i,), daemon=True) for i in range(concurrency)
+    ]
+    for thread in thread_list:
+        thread.start()
+    for thread in thread_list:
+        thread.join()
+    if error_list:
+        raise error_list[0]
+    return time.monotonic() - begin
+
+
+def timed_request(transport, recorder: Recorder, scenario: str, method: str, path: str, data=None, token=None):
+    begin = time.perf_counter()
+    try:
+        status, body, queries = transport.request(method, path, data, token)
+    except (http.client.HTTPException, OSError):
+        recorder.add(scenario, time.perf_counter() - begin, False, None)
+        return None, None
+    recorder.add(scenario, time.perf_counter() - begin, 200 <= status < 300, queries)
+    return status, body
+
+
+class SlowClients(object):
+    """
+    Hold `count` connections open with requests trickled one header line
+    every `interval` seconds, like clients on a slow network.
+
+    Runs in one background thread with a selector, so thousands of idle
+    connections cost the benchmark little.
+    """
+
+    def __init__(self, base_url: str, path: str, count: int, interval: float):
+        parts = urlsplit(base_url)
+        self._address = (parts.hostname, parts.port or 80)
+        self._path = path
+        self._count = count
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.opened = 0
+        self.dropped = 0
+        self.alive = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._main, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _main(self):
+        selector = selectors.DefaultSelector()
+        socket_list = []
+        for _ in range(self._count):
+            try:
+                sock = socket.create_connection(self._address, timeout=5)
+                sock.sendall(f'GET {self._path} HTTP/1.1\r\nHost: {self._address[0]}\r\n'.encode('ascii'))
+            except OSError:
+                self.dropped += 1
+                continue
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ)
+            socket_list.append(sock)
+            self.opened += 1
+
+        line = 0
+        while not self._stop.wait(self._interval):
+            # a server which answers or closes has given up on the client
+            for key, _ in selector.select(timeout=0):
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+                socket_list.remove(key.fileobj)
+                self.dropped += 1
+            line += 1
+            for sock in list(socket_list):
+                try:
+                    sock.send(f'X-Slow-{line}: 1\r\n'.encode('ascii'))
+                except OSError:
+                    selector.unregister(sock)
+                    sock.close()
+                    socket_list.remove(sock)
+                    self.dropped += 1
+
+        self.alive = len(socket_list)
+        for sock in socket_list:
+            selector.unregister(sock)
+            sock.close()
+        selector.close()
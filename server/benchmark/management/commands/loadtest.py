@@ -0,0 +1,251 @@
+import json
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmark.harness import (
+    HTTPTransport,
+    InProcessTransport,
+    Recorder,
+    run_workers,
+    timed_request,
+)
+
+
+DEFAULT_MIX = 'login=1,reviews=4,inbox=8,answer=3,invite=1'
+
+
+class Command(BaseCommand):
+    help = 'Drive a mixed workload against the API and report latency/throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default=None,
+            help='base URL of a running server, e.g. http://127.0.0.1:8000, '
+                 'default to in-process requests')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=30,
+            help='seconds to run the workload')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+            help='scenario weights, default: ' + DEFAULT_MIX)
+        parser.add_argument('--employees', type=int, default=20,
+            help='employees to log in and act as')
+        parser.add_argument('--password', default='1234')
+        parser.add_argument('--seed-users', type=int, default=0,
+            help='seed this many employees with createtestdata first')
+        parser.add_argument('--seed-reviews', type=int, default=0)
+        parser.add_argument('--seed-requests-per-review', type=int, default=0)
+        parser.add_argument('--output', default=None,
+            help='write the results to this JSON file')
+        parser.add_argument('--compare', default=None,
+            help='JSON results of a previous run to compare with')
+        parser.add_argument('--max-regression', type=float, default=None,
+            help='fail if any p95 latency is this many percent worse than --compare')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['seed_users']:
+            call_command(
+                'createtestdata',
+                users=kwargs['seed_users'],
+                reviews=kwargs['seed_reviews'],
+                requests_per_review=kwargs['seed_requests_per_review'],
+                password=kwargs['password'],
+                stdout=self.stdout,
+            )
+
+        target = kwargs['target']
+        if target:
+            make_transport = lambda: HTTPTransport(target)
+        else:
+            make_transport = InProcessTransport
+
+        mix = parse_mix(kwargs['mix'])
+        context = self._prepare(make_transport(), kwargs['employees'], kwargs['password'])
+        recorder = Recorder()
+        worker = make_worker(mix, context)
+        elapsed = run_workers(
+            make_transport,
+            worker,
+            kwargs['concurrency'],
+            kwargs['duration'],
+            recorder,
+        )
+
+        results = recorder.summary(elapsed)
+        report = {
+            'timestamp': time.time(),
+            'config': {
+                'target': target or 'in-process',
+                'concurrency': kwargs['concurrency'],
+                'duration': kwargs['duration'],
+                'mix': mix,
+                'employees': len(context['employees']),
+            },
+            'results': results,
+        }
+        self._print(results)
+        if kwargs['output']:
+            with open(kwargs['output'], 'w') as fout:
+                json.dump(report, fout, indent=2)
+        if kwargs['compare']:
+            with open(kwargs['compare'], 'r') as fin:
+                baseline = json.load(fin)
+            self._compare(baseline['results'], results, kwargs['max_regression'])
+
+    def _prepare(self, transport, employee_count, password):
+        """
+        Log in as admin and a pool of employees, and collect the ids the
+        scenarios need.
+        """
+        try:
+            status, body, _ = transport.request('POST', '/api/v1/tokens/', {
+                'username': 'admin',
+                'password': password,
+            })
+            if status != 200:
+                raise CommandError('cannot log in as admin, seed the database first')
+            admin_token = body['token']
+
+            status, body, _ = transport.request('GET', '/api/v1/employees/', {
+                'page_size': max(employee_count, 100),
+            }, admin_token)
+            user_list = body['results']
+            participant_id_list = [user['id'] for user in user_list]
+
+            employee_list = []
+            for user in user_list[:employee_count]:
+                status, body, _ = transport.request('POST', '/api/v1/tokens/', {
+                    'username': user['username'],
+                    'password': password,
+                })
+                if status != 200:
+                    continue
+                token = body['token']
+                status, body, _ = transport.request('GET', '/api/v1/feedbacks/', None, token)
+                feedback_id_list = [feedback['id'] for feedback in body['results']]
+                employee_list.append({
+                    'username': user['username'],
+                    'token': token,
+                    'feedbacks': feedback_id_list,
+                })
+            if not employee_list:
+                raise CommandError('no employee can log in')
+
+            status, body, _ = transport.request('GET', '/api/v1/reviews/', None, admin_token)
+            review_id_list = [review['id'] for review in body['results']]
+        finally:
+            transport.close()
+        return {
+            'password': password,
+            'admin_token': admin_token,
+            'employees': employee_list,
+            'participants': participant_id_list,
+            'reviews': review_id_list,
+        }
+
+    def _print(self, results):
+        self.stdout.write(
+            f'{"scenario":<10} {"requests":>9} {"errors":>7} {"rps":>9} '
+            f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8}'
+        )
+        for scenario, row in results.items():
+            self.stdout.write(
+                f'{scenario:<10} {row["requests"]:>9} {row["errors"]:>7} '
+                f'{_format(row["rps"]):>9} {_format(row["p50_ms"]):>9} '
+                f'{_format(row["p95_ms"]):>9} {_format(row["p99_ms"]):>9} '
+                f'{_format(row["queries_per_request"]):>8}'
+            )
+
+    def _compare(self, baseline, results, max_regression):
+        regression_list = []
+        for scenario, row in results.items():
+            old = baseline.get(scenario, None)
+            if not old or not old['p95_ms'] or not row['p95_ms']:
+                continue
+            change = (row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+            self.stdout.write(
+                f'{scenario:<10} p95 {old["p95_ms"]:.2f} -> {row["p95_ms"]:.2f} ms '
+                f'({change:+.1f}%), rps {_format(old["rps"])} -> {_format(row["rps"])}'
+            )
+            if max_regression is not None and change > max_regression:
+                regression_list.append(scenario)
+        if regression_list:
+            raise CommandError(f'p95 regression in: {", ".join(regression_list)}')
+
+
+def parse_mix(mix: str):
+    rv = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIO_DICT:
+            raise CommandError(f'unknown scenario: {name}')
+        rv[name] = float(weight or 1)
+    return rv
+
+
+def make_worker(mix: dict, context: dict):
+    name_list = list(mix.keys())
+    weight_list = list(mix.values())
+
+    def worker(transport, rng, deadline, recorder):
+        while time.monotonic() < deadline:
+            name = rng.choices(name_list, weight_list)[0]
+            SCENARIO_DICT[name](transport, rng, context, recorder)
+
+    return worker
+
+
+def login(transport, rng, context, recorder):
+    employee = rng.choice(context['employees'])
+    timed_request(transport, recorder, 'login', 'POST', '/api/v1/tokens/', {
+        'username': employee['username'],
+        'password': context['password'],
+    })
+
+
+def list_reviews(transport, rng, context, recorder):
+    timed_request(transport, recorder, 'reviews', 'GET', '/api/v1/reviews/',
+        token=context['admin_token'])
+
+
+def list_feedbacks(transport, rng, context, recorder):
+    employee = rng.choice(context['employees'])
+    timed_request(transport, recorder, 'inbox', 'GET', '/api/v1/feedbacks/',
+        token=employee['token'])
+
+
+def answer_feedback(transport, rng, context, recorder):
+    employee = rng.choice(context['employees'])
+    if not employee['feedbacks']:
+        return list_feedbacks(transport, rng, context, recorder)
+    feedback_id = rng.choice(employee['feedbacks'])
+    timed_request(transport, recorder, 'answer', 'PATCH', f'/api/v1/feedbacks/{feedback_id}/', {
+        'score': rng.randint(0, 100),
+        'memo': 'load test',
+    }, employee['token'])
+
+
+def invite(transport, rng, context, recorder):
+    if not context['reviews']:
+        return list_reviews(transport, rng, context, recorder)
+    review_id = rng.choice(context['reviews'])
+    participant_list = rng.sample(context['participants'], min(10, len(context['participants'])))
+    timed_request(transport, recorder, 'invite', 'POST', f'/api/v1/reviews/{review_id}/:invite', {
+        'participants': participant_list,
+    }, context['admin_token'])
+
+
+SCENARIO_DICT = {
+    'login': login,
+    'reviews': list_reviews,
+    'inbox': list_feedbacks,
+    'answer': answer_feedback,
+    'invite': invite,
+}
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    return f'{value:.2f}'
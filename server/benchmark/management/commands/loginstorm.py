@@ -0,0 +1,120 @@
+import itertools
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmark.harness import (
+    HTTPTransport,
+    InProcessTransport,
+    Recorder,
+    run_workers,
+    timed_request,
+)
+
+
+class Command(BaseCommand):
+    help = 'Measure read latency alone, then during a storm of logins'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default=None,
+            help='base URL of a running server, e.g. http://127.0.0.1:8000, '
+                 'default to in-process requests')
+        parser.add_argument('--read-path', default='/api/v1/employees/:self')
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--password', default='1234')
+        parser.add_argument('--readers', type=int, default=8,
+            help='clients sending reads in both phases')
+        parser.add_argument('--logins', type=int, default=32,
+            help='clients logging in during the storm phase')
+        parser.add_argument('--duration', type=float, default=20,
+            help='seconds of each phase')
+        parser.add_argument('--max-p99-increase', type=float, default=None,
+            help='fail if the read p99 grows by more than this many percent in the storm')
+
+    def handle(self, *args, **kwargs):
+        target = kwargs['target']
+        if target:
+            make_transport = lambda: HTTPTransport(target)
+        else:
+            make_transport = InProcessTransport
+
+        credentials = {
+            'username': kwargs['username'],
+            'password': kwargs['password'],
+        }
+        transport = make_transport()
+        try:
+            status, body, _ = transport.request('POST', '/api/v1/tokens/', credentials)
+        finally:
+            transport.close()
+        if status != 200:
+            raise CommandError(f'cannot log in as {kwargs["username"]}, seed the database first')
+        token = body['token']
+        read_path = kwargs['read_path']
+
+        def make_worker(readers: int):
+            counter = itertools.count()
+
+            def worker(transport, rng, deadline, recorder):
+                if next(counter) < readers:
+                    while time.monotonic() < deadline:
+                        timed_request(transport, recorder, 'read', 'GET', read_path, token=token)
+                else:
+                    while time.monotonic() < deadline:
+                        timed_request(transport, recorder, 'login', 'POST', '/api/v1/tokens/', credentials)
+
+            return worker
+
+        phase_dict = {}
+        for phase, logins in (('baseline', 0), ('storm', kwargs['logins'])):
+            recorder = Recorder()
+            elapsed = run_workers(
+                make_transport,
+                make_worker(kwargs['readers']),
+                kwargs['readers'] + logins,
+                kwargs['duration'],
+                recorder,
+            )
+            phase_dict[phase] = recorder.summary(elapsed)
+
+        transport = make_transport()
+        try:
+            _, hashing, _ = transport.request('GET', '/api/v1/stats/hashing/', None, token)
+        finally:
+            transport.close()
+        self._print(phase_dict, hashing)
+
+        max_increase = kwargs['max_p99_increase']
+        old = phase_dict['baseline']['read']['p99_ms']
+        new = phase_dict['storm']['read']['p99_ms']
+        if max_increase is not None and old and new:
+            if (new - old) / old * 100 > max_increase:
+                raise CommandError(f'read p99 went from {old:.2f} to {new:.2f} ms')
+
+    def _print(self, phase_dict, hashing):
+        self.stdout.write(
+            f'{"phase":<9} {"scenario":<8} {"requests":>9} {"errors":>7} {"rps":>9} '
+            f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}'
+        )
+        for phase, results in phase_dict.items():
+            for scenario in ('read', 'login'):
+                row = results.get(scenario, None)
+                if row is None:
+                    continue
+                self.stdout.write(
+                    f'{phase:<9} {scenario:<8} {row["requests"]:>9} {row["errors"]:>7} '
+                    f'{_format(row["rps"]):>9} {_format(row["p50_ms"]):>9} '
+                    f'{_format(row["p95_ms"]):>9} {_format(row["p99_ms"]):>9}'
+                )
+        if hashing:
+            self.stdout.write(
+                f'hashing: {hashing["calls"]} calls, {hashing["rejected"]} rejected, '
+                f'queue wait p50 {_format(hashing["wait_p50_ms"])} ms, '
+                f'p99 {_format(hashing["wait_p99_ms"])} ms'
+            )
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    return f'{value:.2f}'
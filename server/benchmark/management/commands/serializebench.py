@@ -0,0 +1,104 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from account.serializers import UserCreateSerializer, user_values
+from review.models import ReviewRequest
+from review.serializers import ReviewRequestRetriveSerializer, review_request_values
+from server.renderers import FastJSONRenderer, orjson
+
+
+def _get_targets():
+    # the querysets of the list views, without the per-user filters
+    return {
+        'employees': (
+            User.objects
+                .filter(user_extra__is_admin=False, user_extra__is_active=True)
+                .select_related('user_extra'),
+            UserCreateSerializer,
+            user_values,
+        ),
+        'feedbacks': (
+            ReviewRequest.objects.select_related(
+                'review__owner__user_extra',
+                'owner__user_extra',
+                'reviewresponse',
+            ),
+            ReviewRequestRetriveSerializer,
+            review_request_values,
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Time fetching, serializing and rendering list rows with model serializers and values() mappings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000,
+            help='rows to load per run, seed the database with createtestdata first')
+        parser.add_argument('--repeat', type=int, default=5,
+            help='runs per step, the best one is reported')
+        parser.add_argument('--only', choices=list(_get_targets().keys()), default=None)
+
+    def handle(self, *args, **kwargs):
+        rows = kwargs['rows']
+        repeat = kwargs['repeat']
+        targets = _get_targets()
+        if kwargs['only']:
+            targets = {kwargs['only']: targets[kwargs['only']]}
+
+        if orjson is None:
+            self.stdout.write('orjson is not installed, FastJSONRenderer falls back to JSONRenderer')
+        self.stdout.write(
+            f'{"endpoint":<10} {"path":<8} {"rows":>6} '
+            f'{"fetch ms":>9} {"serialize ms":>13} {"json ms":>9} {"orjson ms":>10}'
+        )
+        for name, (queryset, serializer_class, mapping) in targets.items():
+            queryset = queryset.order_by('pk')[:rows]
+            model_data, model_timing = self._run(
+                # a fresh queryset, so the result cache is not reused
+                lambda: list(queryset.all()),
+                lambda instance_list: serializer_class(instance_list, many=True).data,
+                repeat,
+            )
+            values_data, values_timing = self._run(
+                lambda: list(queryset.values('pk', *mapping.lookups)),
+                lambda row_list: [mapping(row) for row in row_list],
+                repeat,
+            )
+            if not model_data:
+                raise CommandError(f'no {name} to serialize, seed the database first')
+            if JSONRenderer().render(model_data) != FastJSONRenderer().render(values_data):
+                raise CommandError(f'{name}: the values() mapping renders differently')
+
+            for path, timing in (('model', model_timing), ('values', values_timing)):
+                # per 10k rows
+                scale = 10000 / len(model_data)
+                self.stdout.write(
+                    f'{name:<10} {path:<8} {len(model_data):>6} '
+                    f'{timing["fetch"] * scale:>9.2f} {timing["serialize"] * scale:>13.2f} '
+                    f'{timing["json"] * scale:>9.2f} {timing["orjson"] * scale:>10.2f}'
+                )
+        self.stdout.write('times are the best of each step, scaled to 10k rows')
+
+    def _run(self, fetch, serialize, repeat):
+        timing = {}
+        loaded = _best(timing, 'fetch', fetch, repeat)
+        data = _best(timing, 'serialize', lambda: serialize(loaded), repeat)
+        _best(timing, 'json', lambda: JSONRenderer().render(data), repeat)
+        _best(timing, 'orjson', lambda: FastJSONRenderer().render(data), repeat)
+        return data, timing
+
+
+def _best(timing: dict, step: str, fn, repeat: int):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rv = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        if best is None or elapsed < best:
+            best = elapsed
+    timing[step] = best
+    return rv
@@ -0,0 +1,149 @@
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmark.harness import (
+    HTTPTransport,
+    Recorder,
+    SlowClients,
+    run_workers,
+    timed_request,
+)
+
+
+WSGI_COMMAND = '{python} manage.py runserver --noreload --insecure 127.0.0.1:{port}'
+ASGI_COMMAND = '{python} -m uvicorn server.asgi:application --host 127.0.0.1 --port {port}'
+
+
+class Command(BaseCommand):
+    help = 'Compare WSGI and ASGI throughput while many slow clients hold connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-command', default=WSGI_COMMAND,
+            help='command to start the WSGI server, default: ' + WSGI_COMMAND)
+        parser.add_argument('--asgi-command', default=ASGI_COMMAND,
+            help='command to start the ASGI server, default: ' + ASGI_COMMAND)
+        parser.add_argument('--only', choices=['wsgi', 'asgi'], default=None,
+            help='benchmark one of the servers')
+        parser.add_argument('--path', default='/api/v1/employees/:self')
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--password', default='1234')
+        parser.add_argument('--slow-clients', type=int, default=500,
+            help='idle connections held open during the run')
+        parser.add_argument('--slow-interval', type=float, default=1,
+            help='seconds between header lines of a slow client')
+        parser.add_argument('--concurrency', type=int, default=32,
+            help='fast clients measuring throughput')
+        parser.add_argument('--duration', type=float, default=20)
+        parser.add_argument('--token-cache-ttl', type=int, default=60,
+            help='TOKEN_CACHE_TTL of both servers, the ASGI fast paths need it, '
+                 '0 measures the sync_to_async handoff only')
+
+    def handle(self, *args, **kwargs):
+        command_dict = {
+            'wsgi': kwargs['wsgi_command'],
+            'asgi': kwargs['asgi_command'],
+        }
+        if kwargs['only']:
+            command_dict = {kwargs['only']: command_dict[kwargs['only']]}
+
+        env = dict(os.environ, TOKEN_CACHE_TTL=str(kwargs['token_cache_ttl']))
+        self.stdout.write(f'TOKEN_CACHE_TTL={env["TOKEN_CACHE_TTL"]}')
+        result_dict = {}
+        for name, command in command_dict.items():
+            port = _get_free_port()
+            command = command.format(python=shlex.quote(sys.executable), port=port)
+            self.stdout.write(f'{name}: {command}')
+            process = subprocess.Popen(
+                shlex.split(command),
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                _wait_for_port(port, process)
+                result_dict[name] = self._run(base_url, kwargs)
+            finally:
+                process.terminate()
+                process.wait()
+        self._print(result_dict)
+
+    def _run(self, base_url: str, kwargs):
+        transport = HTTPTransport(base_url)
+        try:
+            status, body, _ = transport.request('POST', '/api/v1/tokens/', {
+                'username': kwargs['username'],
+                'password': kwargs['password'],
+            })
+        finally:
+            transport.close()
+        if status != 200:
+            raise CommandError(f'cannot log in as {kwargs["username"]}, seed the database first')
+        token = body['token']
+        path = kwargs['path']
+
+        def worker(transport, rng, deadline, recorder):
+            while time.monotonic() < deadline:
+                timed_request(transport, recorder, 'fast', 'GET', path, token=token)
+
+        slow_clients = SlowClients(base_url, path, kwargs['slow_clients'], kwargs['slow_interval'])
+        slow_clients.start()
+        recorder = Recorder()
+        try:
+            elapsed = run_workers(
+                lambda: HTTPTransport(base_url),
+                worker,
+                kwargs['concurrency'],
+                kwargs['duration'],
+                recorder,
+            )
+        finally:
+            slow_clients.stop()
+        rv = recorder.summary(elapsed)['fast']
+        rv['slow_opened'] = slow_clients.opened
+        rv['slow_alive'] = slow_clients.alive
+        return rv
+
+    def _print(self, result_dict):
+        self.stdout.write(
+            f'{"server":<6} {"slow":>11} {"requests":>9} {"errors":>7} {"rps":>9} '
+            f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}'
+        )
+        for name, row in result_dict.items():
+            slow = f'{row["slow_alive"]}/{row["slow_opened"]}'
+            self.stdout.write(
+                f'{name:<6} {slow:>11} {row["requests"]:>9} {row["errors"]:>7} '
+                f'{_format(row["rps"]):>9} {_format(row["p50_ms"]):>9} '
+                f'{_format(row["p95_ms"]):>9} {_format(row["p99_ms"]):>9}'
+            )
+
+
+def _get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, process, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f'the server exited with {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError('the server did not start in time')
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    return f'{value:.2f}'
@@ -0,0 +1,50 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from account.models import create_user
+
+from .harness import InProcessTransport, Recorder, percentile, timed_request
+
+
+class HarnessTestCase(TestCase):
+
+    def testPercentile(self):
+        sample_list = list(range(1, 101))
+        self.assertEqual(percentile(sample_list, 0.5), 50)
+        self.assertEqual(percentile(sample_list, 0.95), 95)
+        self.assertEqual(percentile(sample_list, 0.99), 99)
+        self.assertIsNone(percentile([], 0.5))
+
+    def testRecordRequests(self):
+        create_user(is_admin=True, username='admin', password='1234')
+        transport = InProcessTransport(host='testserver')
+        recorder = Recorder()
+
+        status, body = timed_request(transport, recorder, 'login', 'POST', '/api/v1/tokens/', {
+            'username': 'admin',
+            'password': '1234',
+        })
+        self.assertEqual(status, 200)
+        timed_request(transport, recorder, 'reviews', 'GET', '/api/v1/reviews/',
+            token=body['token'])
+        timed_request(transport, recorder, 'reviews', 'GET', '/api/v1/reviews/',
+            token='invalid')
+
+        results = recorder.summary(1.0)
+        self.assertEqual(results['login']['requests'], 1)
+        self.assertEqual(results['reviews']['requests'], 2)
+        self.assertEqual(results['reviews']['errors'], 1)
+        self.assertEqual(results['all']['requests'], 3)
+        self.assertEqual(results['all']['rps'], 3.0)
+        self.assertIsNotNone(results['reviews']['queries_per_request'])
+
+    def testSerializeBench(self):
+        for i in range(3):
+            create_user(is_admin=False, username=f'user{i}', password='1234')
+        stdout = StringIO()
+        call_command('serializebench', only='employees', rows=3, repeat=1, stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('employees  model', output)
+        self.assertIn('employees  values', output)
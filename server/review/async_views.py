@@ -0,0 +1,56 @@
+from django.core.cache import cache
+
+from server.async_views import (
+    as_async_view,
+    authenticate_from_cache,
+    is_cache_local,
+    render_json,
+    render_not_modified,
+)
+
+from .cache import etag_matches, make_etag, review_cache_key, review_list_cache_key
+from .views import ReviewListCreateView, ReviewRequestListView, ReviewRetrieveUpdateDestroyView
+
+
+def _get_cached_response(request, view_class, get_key):
+    """
+    The ReviewCacheMixin response of a cache hit or an unchanged poll.
+    """
+    if not is_cache_local():
+        return None
+    if authenticate_from_cache(request, view_class) is None:
+        return None
+    key = get_key()
+    etag = make_etag(key)
+    if etag_matches(request, etag):
+        return render_not_modified({
+            'ETag': etag,
+        })
+    data = cache.get(key)
+    if data is None:
+        return None
+    return render_json(data, headers={
+        'ETag': etag,
+    })
+
+
+def _list_reviews(request, *args, **kwargs):
+    return _get_cached_response(
+        request,
+        ReviewListCreateView,
+        lambda: review_list_cache_key('review-list', request.GET),
+    )
+
+
+def _retrieve_review(request, *args, **kwargs):
+    return _get_cached_response(
+        request,
+        ReviewRetrieveUpdateDestroyView,
+        lambda: review_cache_key('review-detail', kwargs['pk']),
+    )
+
+
+review_list = as_async_view(ReviewListCreateView, fast_path=_list_reviews)
+review_detail = as_async_view(ReviewRetrieveUpdateDestroyView, fast_path=_retrieve_review)
+# needs the database on every poll, served in one handoff
+feedback_list = as_async_view(ReviewRequestListView)
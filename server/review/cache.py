@@ -0,0 +1,124 @@
+"""
+Versioned cache keys for review data.
+
+Every review has a version, and so does the review list as a whole. A write
+to a review, its requests or its responses bumps both once its transaction
+commits, so stale entries are never read again and simply expire. Versions
+live in the cache themselves; a version lost to eviction restarts from the
+current time, never from an older value.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+GENERATION_KEY = 'review-generation'
+LIST_VERSION_KEY = 'review-list-version'
+
+
+def _review_version_key(review_id: int):
+    return f'review-version:{review_id}'
+
+
+def _get_version(key: str):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def review_cache_key(prefix: str, review_id: int):
+    generation = _get_version(GENERATION_KEY)
+    version = _get_version(_review_version_key(review_id))
+    return f'{prefix}:{generation}:{review_id}:{version}'
+
+
+def review_list_cache_key(prefix: str, query_params):
+    generation = _get_version(GENERATION_KEY)
+    version = _get_version(LIST_VERSION_KEY)
+    query = '&'.join(f'{k}={v}' for k, v in sorted(query_params.items()))
+    digest = hashlib.md5(query.encode('utf-8')).hexdigest()
+    return f'{prefix}:{generation}:{version}:{digest}'
+
+
+def make_etag(key: str):
+    return '"{0}"'.format(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+
+def etag_matches(request, etag: str):
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    return etag in if_none_match or '*' in if_none_match
+
+
+def invalidate_reviews(review_id_list):
+    # bumped before the commit, a concurrent read could cache the old rows
+    # under the new version
+    review_id_list = list(review_id_list)
+    transaction.on_commit(lambda: _bump_reviews(review_id_list))
+
+
+def invalidate_all_reviews():
+    transaction.on_commit(lambda: cache.set(GENERATION_KEY, time.time_ns(), None))
+
+
+def _bump_reviews(review_id_list: list):
+    version = time.time_ns()
+    version_dict = {
+        _review_version_key(review_id): version for review_id in review_id_list
+    }
+    version_dict[LIST_VERSION_KEY] = version
+    cache.set_many(version_dict, None)
+
+
+class ReviewCacheMixin(object):
+    """
+    Serve list/retrieve of review views from the cache, with ETags.
+
+    A matching If-None-Match is answered with 304 before the queryset is
+    touched. Use a shared cache backend when running several processes.
+    """
+
+    # a lagging replica would store stale data under the new version
+    read_from_replica = False
+
+    def list(self, request, *args, **kwargs):
+        key = review_list_cache_key('review-list', request.query_params)
+        return self._get_cached_response(
+            request,
+            key,
+            lambda: super(ReviewCacheMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        key = review_cache_key('review-detail', self.kwargs['pk'])
+        return self._get_cached_response(
+            request,
+            key,
+            lambda: super(ReviewCacheMixin, self).retrieve(request, *args, **kwargs),
+        )
+
+    def _get_cached_response(self, request, key: str, get_response):
+        etag = make_etag(key)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={
+                'ETag': etag,
+            })
+
+        data = cache.get(key)
+        if data is None:
+            response = get_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, settings.REVIEW_RESPONSE_CACHE_TIMEOUT)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,75 @@
+import logging
+
+from django.db import transaction
+
+from .models import InviteJob, invite_participants
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_invite_job(job_id: int, batch_size: int) -> InviteJob:
+    """
+    Create the review requests of an invite job, one chunk per transaction.
+
+    Every chunk commits its requests together with the job progress, and
+    invite_participants skips people who are already invited, so a job
+    interrupted by a crashed worker can simply be run again.
+    """
+    job = InviteJob.objects.get(pk=job_id)
+    participants = job.participants
+    while True:
+        with transaction.atomic():
+            job = (InviteJob.objects
+                .select_for_update()
+                .select_related('review')
+                .defer('participants')
+                .get(pk=job_id)
+            )
+            if job.status in (InviteJob.DONE, InviteJob.FAILED):
+                return job
+            chunk = participants[job.processed:job.processed + batch_size]
+            if not chunk:
+                job.status = InviteJob.DONE
+                job.save(update_fields=['status'])
+                return job
+            created, skipped, invalid = invite_participants(job.review, chunk, batch_size)
+            job.status = InviteJob.RUNNING
+            job.processed += len(chunk)
+            job.created_count += len(created)
+            job.skipped_count += len(skipped)
+            job.invalid = job.invalid + invalid
+            job.save(update_fields=[
+                'status',
+                'processed',
+                'created_count',
+                'skipped_count',
+                'invalid',
+            ])
+
+
+def run_pending_invite_jobs(batch_size: int) -> int:
+    """
+    Run every unfinished invite job, including ones a dead worker left behind.
+
+    Returns the number of jobs handled.
+    """
+    count = 0
+    while True:
+        job = (InviteJob.objects
+            .filter(status__in=[InviteJob.PENDING, InviteJob.RUNNING])
+            .order_by('pk')
+            .only('pk')
+            .first()
+        )
+        if job is None:
+            return count
+        try:
+            run_invite_job(job.pk, batch_size)
+        except Exception as e:
+            logger.exception('invite job %d failed', job.pk)
+            InviteJob.objects.filter(pk=job.pk).update(
+                status=InviteJob.FAILED,
+                error=str(e),
+            )
+        count += 1
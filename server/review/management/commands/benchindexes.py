@@ -0,0 +1,167 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, migrations, models, transaction
+from django.db.migrations.loader import MigrationLoader
+
+from account.models import UserExtra
+from review.models import Review, ReviewRequest
+
+
+def _get_indexes():
+    # the composite indexes and constraints being compared
+    for model in (UserExtra, Review, ReviewRequest):
+        opts = model._meta
+        for item in [*opts.indexes, *opts.constraints]:
+            yield opts.app_label, opts.model_name, item
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare query plans and timings of the review access patterns with and '
+        'without the composite indexes. Drops and recreates the indexes, so '
+        'run it against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true',
+            help='insert a synthetic dataset first')
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--reviews', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=50,
+            help='executions per query')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['seed']:
+            self._seed(kwargs['users'], kwargs['reviews'], kwargs['requests'])
+
+        owner_id = ReviewRequest.objects.order_by('-pk').values_list('owner_id', flat=True).first()
+        review_id = ReviewRequest.objects.order_by('-pk').values_list('review_id', flat=True).first()
+        if owner_id is None:
+            self.stderr.write('No review requests, run with --seed')
+            return
+        review_owner_id = Review.objects.get(pk=review_id).owner_id
+        query_dict = {
+            'feedback inbox': lambda: (ReviewRequest.objects
+                .filter(owner_id=owner_id)
+                .order_by('pk')[:100]
+            ),
+            'requests of review': lambda: (ReviewRequest.objects
+                .filter(review_id=review_id)
+                .order_by('pk')[:100]
+            ),
+            'invited check': lambda: (ReviewRequest.objects
+                .filter(review_id=review_id, owner_id=owner_id)
+            ),
+            'reviews of user': lambda: (Review.objects
+                .filter(owner_id=review_owner_id)
+                .order_by('pk')[:100]
+            ),
+            'active employees': lambda: (User.objects
+                .filter(user_extra__is_admin=False, user_extra__is_active=True)
+                .order_by('pk')[:100]
+            ),
+        }
+
+        self._drop_indexes()
+        try:
+            before = self._measure(query_dict, kwargs['repeat'])
+        finally:
+            self._create_indexes()
+        after = self._measure(query_dict, kwargs['repeat'])
+
+        for name in query_dict:
+            self.stdout.write(f'== {name}')
+            for label, result in (('before', before[name]), ('after', after[name])):
+                median, p95, plan = result
+                self.stdout.write(f'-- {label}: median {median:.3f} ms, p95 {p95:.3f} ms')
+                self.stdout.write(plan)
+
+    def _measure(self, query_dict, repeat):
+        rv = {}
+        for name, make_query in query_dict.items():
+            plan = make_query().explain()
+            timing_list = []
+            for _ in range(repeat):
+                begin = time.perf_counter()
+                list(make_query())
+                timing_list.append((time.perf_counter() - begin) * 1000)
+            timing_list.sort()
+            p95 = timing_list[min(len(timing_list) - 1, int(len(timing_list) * 0.95))]
+            rv[name] = (statistics.median(timing_list), p95, plan)
+        return rv
+
+    def _drop_indexes(self):
+        # only the composite indexes, migrating back would also drop columns
+        # added after them, e.g. updated_at, which the queries still select
+        state = MigrationLoader(connection).project_state()
+        self._dropped_state = self._apply(state, [
+            (app_label, migrations.RemoveIndex(model_name, item.name)
+                if isinstance(item, models.Index)
+                else migrations.RemoveConstraint(model_name, item.name))
+            for app_label, model_name, item in _get_indexes()
+        ])
+
+    def _create_indexes(self):
+        self._apply(self._dropped_state, [
+            (app_label, migrations.AddIndex(model_name, item)
+                if isinstance(item, models.Index)
+                else migrations.AddConstraint(model_name, item))
+            for app_label, model_name, item in _get_indexes()
+        ])
+        with connection.cursor() as cursor:
+            # refresh planner statistics for the new indexes
+            cursor.execute('ANALYZE')
+
+    def _apply(self, state, operation_list):
+        # as the migration executor does, SQLite rebuilds tables from the state
+        with connection.schema_editor() as editor:
+            for app_label, operation in operation_list:
+                new_state = state.clone()
+                operation.state_forwards(app_label, new_state)
+                operation.database_forwards(app_label, editor, state, new_state)
+                state = new_state
+        return state
+
+    @transaction.atomic
+    def _seed(self, user_count, review_count, request_count):
+        chunk_size = 10000
+        self.stdout.write(f'Seeding {user_count} users')
+        base_id = (User.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+        for offset in range(0, user_count, chunk_size):
+            size = min(chunk_size, user_count - offset)
+            User.objects.bulk_create(
+                User(pk=base_id + offset + i, username=f'bench{base_id + offset + i}', password='!')
+                for i in range(size)
+            )
+            UserExtra.objects.bulk_create(
+                UserExtra(user_id=base_id + offset + i, is_admin=False)
+                for i in range(size)
+            )
+        user_id_list = list(range(base_id, base_id + user_count))
+
+        self.stdout.write(f'Seeding {review_count} reviews')
+        base_review_id = (Review.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+        Review.objects.bulk_create((
+            Review(pk=base_review_id + i, owner_id=user_id_list[i % user_count], title=f'review {i}')
+            for i in range(review_count)
+        ), batch_size=chunk_size)
+
+        self.stdout.write(f'Seeding {request_count} review requests')
+        per_review = min(user_count, -(-request_count // review_count))
+        request_list = []
+        created = 0
+        for i in range(review_count):
+            for j in range(per_review):
+                if created >= request_count:
+                    break
+                owner_id = user_id_list[(i + j) % user_count]
+                request_list.append(ReviewRequest(review_id=base_review_id + i, owner_id=owner_id))
+                created += 1
+            if len(request_list) >= chunk_size:
+                ReviewRequest.objects.bulk_create(request_list)
+                request_list = []
+        ReviewRequest.objects.bulk_create(request_list)
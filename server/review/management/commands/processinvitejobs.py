@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from review.jobs import run_pending_invite_jobs
+
+
+class Command(BaseCommand):
+    help = 'Process queued review invite jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+            help='exit when the queue is empty instead of polling')
+        parser.add_argument('--interval', type=float, default=1.0,
+            help='seconds to wait between polls of an empty queue')
+        parser.add_argument('--batch-size', type=int,
+            default=settings.REVIEW_INVITE_BATCH_SIZE,
+            help='participants per chunk')
+
+    def handle(self, *args, **kwargs):
+        while True:
+            count = run_pending_invite_jobs(kwargs['batch_size'])
+            if count:
+                self.stdout.write(f'Processed {count} invite jobs')
+            if kwargs['once']:
+                return
+            time.sleep(kwargs['interval'])
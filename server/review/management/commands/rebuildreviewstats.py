@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from review.models import rebuild_review_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized score/requested/responsed columns of reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('review_id', nargs='*', type=int,
+            help='reviews to rebuild, default to all reviews')
+
+    def handle(self, *args, **kwargs):
+        review_id_list = kwargs['review_id'] or None
+        with transaction.atomic():
+            count = rebuild_review_stats(review_id_list)
+        self.stdout.write(f'Rebuilt {count} reviews')
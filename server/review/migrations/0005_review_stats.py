@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:13
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_review_stats(apps, schema_editor):
+    Review = apps.get_model('review', 'Review')
+    ReviewRequest = apps.get_model('review', 'ReviewRequest')
+    ReviewResponse = apps.get_model('review', 'ReviewResponse')
+    request_list = (ReviewRequest.objects
+        .filter(review=OuterRef('pk'))
+        .order_by()
+        .values('review')
+    )
+    response_list = (ReviewResponse.objects
+        .filter(request__review=OuterRef('pk'))
+        .order_by()
+        .values('request__review')
+    )
+    Review.objects.update(
+        request_count=Coalesce(Subquery(
+            request_list.annotate(value=Count('pk')).values('value'),
+        ), Value(0)),
+        response_count=Coalesce(Subquery(
+            response_list.annotate(value=Count('pk')).values('value'),
+        ), Value(0)),
+        score_sum=Coalesce(Subquery(
+            response_list.annotate(value=Sum('score')).values('value'),
+        ), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0004_auto_20210222_0306'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='request_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='response_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='score_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_review_stats, migrations.RunPython.noop),
+    ]
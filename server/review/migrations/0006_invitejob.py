@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0005_review_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InviteJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('participants', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('total', models.IntegerField()),
+                ('processed', models.IntegerField(default=0)),
+                ('created_count', models.IntegerField(default=0)),
+                ('skipped_count', models.IntegerField(default=0)),
+                ('invalid', models.JSONField(default=list)),
+                ('error', models.TextField(blank=True, default='')),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='review.review')),
+            ],
+        ),
+    ]
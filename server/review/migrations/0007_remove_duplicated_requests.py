@@ -0,0 +1,65 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:30
+
+from django.db import migrations
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicated_requests(apps, schema_editor):
+    Review = apps.get_model('review', 'Review')
+    ReviewRequest = apps.get_model('review', 'ReviewRequest')
+    ReviewResponse = apps.get_model('review', 'ReviewResponse')
+    duplicated_list = (ReviewRequest.objects
+        .order_by()
+        .values('review', 'owner')
+        .annotate(count=Count('pk'))
+        .filter(count__gt=1)
+    )
+    review_id_set = set()
+    for row in duplicated_list:
+        request_list = ReviewRequest.objects.filter(review_id=row['review'], owner_id=row['owner'])
+        # keep the oldest answered request, or the oldest one if none answered
+        keep = (request_list
+            .order_by(F('reviewresponse__id').asc(nulls_last=True), 'pk')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        request_list.exclude(pk=keep).delete()
+        review_id_set.add(row['review'])
+    if not review_id_set:
+        return
+    request_list = (ReviewRequest.objects
+        .filter(review=OuterRef('pk'))
+        .order_by()
+        .values('review')
+    )
+    response_list = (ReviewResponse.objects
+        .filter(request__review=OuterRef('pk'))
+        .order_by()
+        .values('request__review')
+    )
+    Review.objects.filter(pk__in=review_id_set).update(
+        request_count=Coalesce(Subquery(
+            request_list.annotate(value=Count('pk')).values('value'),
+        ), Value(0)),
+        response_count=Coalesce(Subquery(
+            response_list.annotate(value=Count('pk')).values('value'),
+        ), Value(0)),
+        score_sum=Coalesce(Subquery(
+            response_list.annotate(value=Sum('score')).values('value'),
+        ), Value(0)),
+    )
+
+
+# a migration of its own, PostgreSQL can not add the unique constraint of
+# 0008_review_indexes in a transaction with pending trigger events of these
+# deletes
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0006_invitejob'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicated_requests, migrations.RunPython.noop),
+    ]
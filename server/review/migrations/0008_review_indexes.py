@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0007_remove_duplicated_requests'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['owner', 'id'], name='review_owner_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewrequest',
+            index=models.Index(fields=['owner', 'id'], name='reviewrequest_owner_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reviewrequest',
+            constraint=models.UniqueConstraint(fields=('review', 'owner'), name='reviewrequest_review_owner_uniq'),
+        ),
+    ]
@@ -1,16 +1,57 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Avg, Case, Count, Exists, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+from .cache import invalidate_all_reviews, invalidate_reviews
+
+
+def average_score(score_sum: int, response_count: int):
+    """
+    The score of a review, as the API and the exports show it.
+    """
+    if response_count <= 0:
+        return 0
+    return score_sum / response_count
 
 
 class Review(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, null=False)
     title = models.CharField(max_length=255)
+    # denormalized aggregates, maintained by review.signals
+    request_count = models.IntegerField(null=False, default=0, editable=False)
+    response_count = models.IntegerField(null=False, default=0, editable=False)
+    score_sum = models.IntegerField(null=False, default=0, editable=False)
+    # also touched by the aggregate maintenance
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # reviews of an employee, paginated by pk
+            models.Index(fields=['owner', 'id'], name='review_owner_id_idx'),
+        ]
+
+    @property
+    def score(self):
+        return average_score(self.score_sum, self.response_count)
 
 
 class ReviewRequest(models.Model):
     review = models.ForeignKey(Review, on_delete=models.CASCADE, null=False)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, null=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            # also serves the lookups by review
+            models.UniqueConstraint(fields=['review', 'owner'], name='reviewrequest_review_owner_uniq'),
+        ]
+        indexes = [
+            # feedback inbox, paginated by pk
+            models.Index(fields=['owner', 'id'], name='reviewrequest_owner_id_idx'),
+        ]
 
 
 class ReviewResponse(models.Model):
@@ -20,3 +61,187 @@ class ReviewResponse(models.Model):
         MaxValueValidator(100),
     ])
     memo = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the stored score, so updates can adjust the review sum
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
+
+
+class InviteJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, null=False)
+    participants = models.JSONField(null=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    total = models.IntegerField(null=False)
+    # participants[:processed] are committed, the worker resumes from here
+    processed = models.IntegerField(null=False, default=0)
+    created_count = models.IntegerField(null=False, default=0)
+    skipped_count = models.IntegerField(null=False, default=0)
+    invalid = models.JSONField(null=False, default=list)
+    error = models.TextField(blank=True, default='')
+
+
+def rebuild_review_stats(review_id_list=None):
+    """
+    Recompute the denormalized aggregates of reviews from scratch.
+
+    Rebuilds every review if `review_id_list` is None.
+    """
+    request_list = (ReviewRequest.objects
+        .filter(review=OuterRef('pk'))
+        .order_by()
+        .values('review')
+    )
+    response_list = (ReviewResponse.objects
+        .filter(request__review=OuterRef('pk'))
+        .order_by()
+        .values('request__review')
+    )
+    queryset = Review.objects.all()
+    if review_id_list is not None:
+        queryset = queryset.filter(pk__in=review_id_list)
+    rv = queryset.update(
+        request_count=Coalesce(Subquery(
+            request_list.annotate(value=Count('pk')).values('value'),
+        ), Value(0)),
+        response_count=Coalesce(Subquery(
+            response_list.annotate(value=Count('pk')).values('value'),
+        ), Value(0)),
+        score_sum=Coalesce(Subquery(
+            response_list.annotate(value=Sum('score')).values('value'),
+        ), Value(0)),
+        updated_at=timezone.now(),
+    )
+    invalidate_all_reviews()
+    return rv
+
+
+def adjust_review_stats(delta_dict: dict):
+    """
+    Add deltas to the denormalized aggregates of many reviews in one UPDATE.
+
+    `delta_dict` maps review ids to dicts of {field: delta}, where field is
+    one of request_count, response_count and score_sum. Used by bulk writes,
+    which bypass the signals in review.signals.
+    """
+    update_dict = {}
+    for field in ('request_count', 'response_count', 'score_sum'):
+        when_list = [
+            When(pk=review_id, then=Value(delta[field]))
+            for review_id, delta in delta_dict.items()
+            if delta.get(field, 0)
+        ]
+        if when_list:
+            update_dict[field] = F(field) + Case(*when_list, default=Value(0))
+    if not update_dict:
+        return
+    update_dict['updated_at'] = timezone.now()
+    Review.objects.filter(pk__in=list(delta_dict.keys())).update(**update_dict)
+    invalidate_reviews(delta_dict.keys())
+
+
+def upsert_review_response(review_request: ReviewRequest, score: int, memo: str):
+    """
+    Insert or update the response of `review_request`, keyed on the request.
+
+    The existing response is taken from the `reviewresponse` relation when it
+    is already loaded, so answering costs a single write besides the aggregate
+    maintenance in review.signals. Load it with select_for_update(), the
+    signal computes the score delta from the score it was loaded with.
+    """
+    try:
+        response_ = review_request.reviewresponse
+    except ReviewResponse.DoesNotExist:
+        response_ = None
+
+    if response_ is None:
+        response_ = ReviewResponse(request=review_request, score=score, memo=memo)
+        try:
+            with transaction.atomic():
+                response_.save(force_insert=True)
+        except IntegrityError:
+            # somebody answered at the same time, update that one instead
+            response_ = (ReviewResponse.objects
+                .select_for_update()
+                .get(request=review_request)
+            )
+            response_.request = review_request
+        else:
+            review_request.reviewresponse = response_
+            return response_
+
+    response_.score = score
+    response_.memo = memo
+    response_.save(update_fields=['score', 'memo', 'updated_at'])
+    review_request.reviewresponse = response_
+    return response_
+
+
+def annotate_review_stats(queryset):
+    """
+    Compute score/requested/responsed of reviews from the requests and
+    responses, to check the stored aggregates against. The API serves the
+    stored aggregates, which are authoritative.
+    """
+    return queryset.annotate(
+        avg_score=Avg('reviewrequest__reviewresponse__score'),
+        requested=Count('reviewrequest'),
+        responsed=Count('reviewrequest__reviewresponse'),
+    )
+
+
+def invite_participants(review: Review, user_id_list: list, batch_size: int):
+    """
+    Create review requests for `user_id_list` in `batch_size` chunks.
+
+    Users already invited to the review are skipped, and ids which do not
+    belong to any user are reported as invalid.
+
+    Returns a (created, skipped, invalid) tuple of user id lists.
+    """
+    # keep the order of the participants but drop duplicated ids
+    user_id_list = list(dict.fromkeys(user_id_list))
+    created = []
+    skipped = []
+    invalid = []
+    for offset in range(0, len(user_id_list), batch_size):
+        chunk = user_id_list[offset:offset + batch_size]
+        invited = ReviewRequest.objects.filter(review=review, owner=OuterRef('pk'))
+        user_dict = dict(User.objects
+            .filter(pk__in=chunk)
+            .annotate(invited=Exists(invited))
+            .values_list('pk', 'invited')
+        )
+        new_list = []
+        for user_id in chunk:
+            if user_id not in user_dict:
+                invalid.append(user_id)
+            elif user_dict[user_id]:
+                skipped.append(user_id)
+            else:
+                new_list.append(user_id)
+        ReviewRequest.objects.bulk_create(
+            (ReviewRequest(review=review, owner_id=user_id) for user_id in new_list),
+            batch_size=batch_size,
+        )
+        created.extend(new_list)
+    # bulk_create does not send signals, so maintain the aggregate here
+    if created:
+        adjust_review_stats({
+            review.pk: {'request_count': len(created)},
+        })
+    return created, skipped, invalid
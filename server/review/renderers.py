@@ -0,0 +1,56 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+def _split(data):
+    # error responses are plain dicts, render them as a single row
+    if 'header' in data:
+        return data['header'], data['rows']
+    return list(data.keys()), [[_error_text(value) for value in data.values()]]
+
+
+def _error_text(value):
+    # field errors are lists of ErrorDetail, which would come out as reprs
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(_) for _ in value)
+    return str(value)
+
+
+class _Echo(object):
+    """
+    File-like object for csv.writer which hands back what it is given.
+    """
+
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.stream(*_split(data)))
+
+    def stream(self, header, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header).encode(self.charset)
+        for row in rows:
+            yield writer.writerow(row).encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.stream(*_split(data)))
+
+    def stream(self, header, rows):
+        for row in rows:
+            line = json.dumps(dict(zip(header, row)), ensure_ascii=False)
+            yield f'{line}\n'.encode(self.charset)
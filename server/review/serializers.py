@@ -1,28 +1,19 @@
 from rest_framework import serializers
 
-from account.serializers import UserUpdateSerializer
-from .models import Review, ReviewRequest, ReviewResponse
+from account.serializers import UserUpdateSerializer, user_values
+from server.values import ValuesMapping
+from .models import InviteJob, Review, ReviewRequest, ReviewResponse
 
 
 class ReviewSerializer(serializers.ModelSerializer):
+    # the stored aggregates are authoritative, they are maintained by
+    # review.signals and adjust_review_stats, so no JOIN/GROUP BY is needed
     score = serializers.SerializerMethodField()
-    requested = serializers.SerializerMethodField()
-    responsed = serializers.SerializerMethodField()
+    requested = serializers.IntegerField(source='request_count', read_only=True)
+    responsed = serializers.IntegerField(source='response_count', read_only=True)
 
     def get_score(self, instance: Review):
-        responsed = ReviewResponse.objects.filter(request__review=instance).values_list('score', flat=True)
-        if responsed.count() <= 0:
-            return 0
-        sum_ = sum(responsed)
-        return sum_ / responsed.count()
-
-    def get_requested(self, instance: Review):
-        requested = ReviewRequest.objects.filter(review=instance)
-        return requested.count()
-
-    def get_responsed(self, instance: Review):
-        responsed = ReviewResponse.objects.filter(request__review=instance)
-        return responsed.count()
+        return instance.score
 
     class Meta:
         model = Review
@@ -37,10 +28,38 @@ class ReviewSimpleSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'owner']
 
 
+class ReviewUserSerializer(UserUpdateSerializer):
+    requested = serializers.BooleanField(read_only=True)
+
+    class Meta(UserUpdateSerializer.Meta):
+        fields = UserUpdateSerializer.Meta.fields + ['requested']
+
+
+review_user_values = ValuesMapping(dict(user_values.fields, requested='requested'))
+
+
 class ReviewRequestBatchCreateSerializer(serializers.Serializer):
     participants = serializers.ListField(
         child=serializers.IntegerField()
     )
+    # job: queue the invitations for processinvitejobs and return at once
+    mode = serializers.ChoiceField(choices=['sync', 'job'], default='sync')
+
+
+class InviteJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = InviteJob
+        fields = [
+            'id',
+            'review',
+            'status',
+            'total',
+            'processed',
+            'created_count',
+            'skipped_count',
+            'invalid',
+            'error',
+        ]
 
 
 class ReviewRequestListSerializer(serializers.ModelSerializer):
@@ -61,6 +80,22 @@ class ReviewResponseSerializer(serializers.ModelSerializer):
         fields = ['id', 'request', 'score', 'memo']
 
 
+class ReviewResponseBatchItemSerializer(serializers.ModelSerializer):
+    request_id = serializers.IntegerField()
+
+    class Meta:
+        model = ReviewResponse
+        fields = ['request_id', 'score', 'memo']
+
+
+class ReviewResponseBatchSerializer(serializers.Serializer):
+    # items are validated one by one in the view for a per-item report
+    items = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+    )
+
+
 class ReviewRequestRetriveSerializer(serializers.ModelSerializer):
     review = ReviewSimpleSerializer(read_only=True)
     owner = UserUpdateSerializer(read_only=True)
@@ -69,3 +104,21 @@ class ReviewRequestRetriveSerializer(serializers.ModelSerializer):
     class Meta:
         model = ReviewRequest
         fields = ['id', 'review', 'owner', 'reviewresponse']
+
+
+# what ReviewRequestRetriveSerializer renders, for ValuesListMixin
+review_request_values = ValuesMapping({
+    'id': 'id',
+    'review': ValuesMapping({
+        'id': 'id',
+        'title': 'title',
+        'owner': user_values.with_prefix('owner__'),
+    }).with_prefix('review__'),
+    'owner': user_values.with_prefix('owner__'),
+    'reviewresponse': ValuesMapping({
+        'id': 'id',
+        'request': 'request',
+        'score': 'score',
+        'memo': 'memo',
+    }, null_if='id').with_prefix('reviewresponse__'),
+})
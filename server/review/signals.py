@@ -0,0 +1,127 @@
+import contextvars
+from collections import Counter
+
+from django.db.models import Exists, F, OuterRef
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from account.models import employees_deactivated
+
+from .models import (
+    Review,
+    ReviewRequest,
+    ReviewResponse,
+    adjust_review_stats,
+    rebuild_review_stats,
+)
+from .cache import invalidate_reviews
+
+
+# set while deleting many requests whose aggregates are adjusted in bulk
+_bulk_deleting = contextvars.ContextVar('bulk_deleting', default=False)
+
+
+def _get_review_id(response_: ReviewResponse):
+    if ReviewResponse.request.is_cached(response_):
+        return response_.request.review_id
+    return (ReviewRequest.objects
+        .filter(pk=response_.request_id)
+        .values_list('review_id', flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def on_review_changed(sender, instance: Review, **kwargs):
+    invalidate_reviews([instance.pk])
+
+
+@receiver(post_save, sender=ReviewRequest)
+def on_review_request_saved(sender, instance: ReviewRequest, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    Review.objects.filter(pk=instance.review_id).update(
+        request_count=F('request_count') + 1,
+        updated_at=timezone.now(),
+    )
+    invalidate_reviews([instance.review_id])
+
+
+@receiver(post_delete, sender=ReviewRequest)
+def on_review_request_deleted(sender, instance: ReviewRequest, **kwargs):
+    if _bulk_deleting.get():
+        return
+    Review.objects.filter(pk=instance.review_id).update(
+        request_count=F('request_count') - 1,
+        updated_at=timezone.now(),
+    )
+    invalidate_reviews([instance.review_id])
+
+
+@receiver(post_save, sender=ReviewResponse)
+def on_review_response_saved(sender, instance: ReviewResponse, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_score = getattr(instance, '_loaded_score', None)
+    instance._loaded_score = instance.score
+    review_list = Review.objects.filter(reviewrequest=instance.request_id)
+    if created:
+        review_list.update(
+            response_count=F('response_count') + 1,
+            score_sum=F('score_sum') + instance.score,
+            updated_at=timezone.now(),
+        )
+    elif old_score is None:
+        # we don't know the previous score, recompute instead
+        rebuild_review_stats(review_list.values('pk'))
+    elif old_score != instance.score:
+        review_list.update(
+            score_sum=F('score_sum') + (instance.score - old_score),
+            updated_at=timezone.now(),
+        )
+    else:
+        return
+    invalidate_reviews([_get_review_id(instance)])
+
+
+@receiver(post_delete, sender=ReviewResponse)
+def on_review_response_deleted(sender, instance: ReviewResponse, **kwargs):
+    score = getattr(instance, '_loaded_score', None)
+    if score is None:
+        score = instance.score
+    Review.objects.filter(reviewrequest=instance.request_id).update(
+        response_count=F('response_count') - 1,
+        score_sum=F('score_sum') - score,
+        updated_at=timezone.now(),
+    )
+    invalidate_reviews([_get_review_id(instance)])
+
+
+@receiver(employees_deactivated)
+def on_employees_deactivated(sender, user_id_list, cancel_pending, **kwargs):
+    if not cancel_pending:
+        return 0
+    answered = ReviewResponse.objects.filter(request=OuterRef('pk'))
+    # NOT EXISTS instead of a LEFT JOIN, which PostgreSQL can not lock, so
+    # nobody answers a request we are deleting
+    pending_list = list(ReviewRequest.objects
+        .filter(owner_id__in=user_id_list)
+        .filter(~Exists(answered))
+        .select_for_update()
+        .values_list('pk', 'review_id')
+    )
+    if not pending_list:
+        return 0
+
+    token = _bulk_deleting.set(True)
+    try:
+        ReviewRequest.objects.filter(pk__in=[pk for pk, review_id in pending_list]).delete()
+    finally:
+        _bulk_deleting.reset(token)
+    count_dict = Counter(review_id for pk, review_id in pending_list)
+    adjust_review_stats({
+        review_id: {'request_count': -count} for review_id, count in count_dict.items()
+    })
+    return len(pending_list)
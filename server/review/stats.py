@@ -0,0 +1,127 @@
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Aggregate, Avg, Count, FloatField, Max, Min, Q, StdDev
+
+from .cache import review_cache_key
+from .models import ReviewResponse
+
+
+BUCKET_SIZE = 10
+BUCKET_COUNT = 10
+PERCENTILE_DICT = {
+    'p10': 0.1,
+    'median': 0.5,
+    'p90': 0.9,
+}
+
+
+class PercentileCont(Aggregate):
+    """
+    PERCENTILE_CONT ordered-set aggregate, PostgreSQL only.
+    """
+
+    function = 'PERCENTILE_CONT'
+    name = 'PercentileCont'
+    template = '%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile: float, **extra):
+        super().__init__(expression, percentile=float(percentile), **extra)
+
+
+def get_review_stats(review_id: int):
+    """
+    Score statistics of a review, cached until the review is written to.
+    """
+    key = review_cache_key('review-stats', review_id)
+    rv = cache.get(key)
+    if rv is None:
+        rv = compute_review_stats(review_id)
+        cache.set(key, rv, settings.REVIEW_STATS_CACHE_TIMEOUT)
+    return rv
+
+
+def compute_review_stats(review_id: int):
+    """
+    Mean, median, p10/p90, standard deviation and a histogram of 10-point
+    buckets of the scores of a review.
+
+    Everything is one aggregate query on PostgreSQL. Other backends lack
+    PERCENTILE_CONT, so the percentiles come from a second query which
+    groups by score, at most 101 rows since scores are 0 to 100.
+    """
+    response_list = ReviewResponse.objects.filter(request__review_id=review_id)
+    aggregate_dict = {
+        'count': Count('pk'),
+        'mean': Avg('score'),
+        'stddev': StdDev('score'),
+        'min': Min('score'),
+        'max': Max('score'),
+    }
+    for index in range(BUCKET_COUNT):
+        lower = index * BUCKET_SIZE
+        condition = Q(score__gte=lower)
+        # the last bucket includes the max score
+        if index < BUCKET_COUNT - 1:
+            condition &= Q(score__lt=lower + BUCKET_SIZE)
+        aggregate_dict[f'bucket_{index}'] = Count('pk', filter=condition)
+    has_percentile = connection.vendor == 'postgresql'
+    if has_percentile:
+        for name, rate in PERCENTILE_DICT.items():
+            aggregate_dict[name] = PercentileCont('score', rate)
+
+    row = response_list.aggregate(**aggregate_dict)
+
+    rv = {
+        'review': review_id,
+        'count': row['count'],
+        'mean': row['mean'],
+        'stddev': row['stddev'],
+        'min': row['min'],
+        'max': row['max'],
+        'histogram': [
+            {
+                'from': index * BUCKET_SIZE,
+                'to': (index + 1) * BUCKET_SIZE - 1 if index < BUCKET_COUNT - 1 else 100,
+                'count': row[f'bucket_{index}'],
+            }
+            for index in range(BUCKET_COUNT)
+        ],
+    }
+    if has_percentile:
+        for name in PERCENTILE_DICT:
+            rv[name] = row[name]
+    elif row['count'] > 0:
+        distribution = list(response_list
+            .order_by('score')
+            .values_list('score')
+            .annotate(count=Count('pk'))
+        )
+        for name, rate in PERCENTILE_DICT.items():
+            rv[name] = percentile_cont(distribution, row['count'], rate)
+    else:
+        for name in PERCENTILE_DICT:
+            rv[name] = None
+    return rv
+
+
+def percentile_cont(distribution: list, total: int, rate: float):
+    """
+    Same as SQL PERCENTILE_CONT, from sorted (value, count) pairs.
+    """
+    position = rate * (total - 1)
+    lower_rank = math.floor(position)
+    upper_rank = math.ceil(position)
+    lower = upper = None
+    seen = 0
+    for value, count in distribution:
+        seen += count
+        if lower is None and lower_rank < seen:
+            lower = value
+        if upper_rank < seen:
+            upper = value
+            break
+    return lower + (upper - lower) * (position - lower_rank)
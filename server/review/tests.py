@@ -1,9 +1,21 @@
+import json
+import statistics
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 
+from account.authentication import token_cache
 from account.models import create_user
+from server.testing import async_request
 
-from .models import Review, ReviewRequest, ReviewResponse
+from .models import Review, ReviewRequest, ReviewResponse, rebuild_review_stats
+from .serializers import ReviewRequestRetriveSerializer, ReviewUserSerializer
 
 
 def get_auth_header(client: Client, username: str, password: str):
@@ -20,6 +32,7 @@ def get_auth_header(client: Client, username: str, password: str):
 class ReviewTestCase(TestCase):
 
     def setUp(self) -> None:
+        cache.clear()
         for i in range(10):
             create_user(is_admin=False, username=f'user{i}', password='1234')
         create_user(is_admin=True, username='admin', password='1234')
@@ -74,7 +87,7 @@ class ReviewTestCase(TestCase):
             'user': 1,
         }, **headers)
         self.assertEqual(response.status_code, 200)
-        data = response.json()
+        data = response.json()['results']
         self.assertEqual(len(data), 1)
 
     def testBatchCreateReviewRequest(self):
@@ -89,6 +102,59 @@ class ReviewTestCase(TestCase):
         }, **headers)
         self.assertEqual(response.status_code, 201)
 
+    def testBatchCreateReviewRequestSkipExisting(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        request_ = ReviewRequest(review=review, owner=User.objects.get(pk=2))
+        request_.save()
+
+        headers = get_auth_header(self.client, username='admin', password='1234')
+
+        with self.settings(REVIEW_INVITE_BATCH_SIZE=2):
+            response = self.client.post(f'/api/v1/reviews/1/:invite', {
+                'participants': [2, 3, 4, 5, 999, 3],
+            }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['created'], [3, 4, 5])
+        self.assertEqual(data['skipped'], [2])
+        self.assertEqual(data['invalid'], [999])
+        self.assertEqual(ReviewRequest.objects.filter(review=review).count(), 4)
+        review.refresh_from_db()
+        self.assertEqual(review.request_count, 4)
+
+    def testInviteJob(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+
+        headers = get_auth_header(self.client, username='admin', password='1234')
+
+        response = self.client.post(f'/api/v1/reviews/1/:invite', {
+            'participants': [2, 3, 4, 5, 999],
+            'mode': 'job',
+        }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+        self.assertEqual(ReviewRequest.objects.count(), 0)
+
+        # pretend a previous worker crashed after the first chunk
+        ReviewRequest(review=review, owner=User.objects.get(pk=2)).save()
+        ReviewRequest(review=review, owner=User.objects.get(pk=3)).save()
+        call_command('processinvitejobs', once=True, batch_size=2, stdout=StringIO())
+
+        response = self.client.get(f'/api/v1/invite-jobs/{job_id}/', **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'done')
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(data['processed'], 5)
+        self.assertEqual(data['created_count'], 2)
+        self.assertEqual(data['skipped_count'], 2)
+        self.assertEqual(data['invalid'], [999])
+        self.assertEqual(ReviewRequest.objects.filter(review=review).count(), 4)
+
     def testListReviewRequest(self):
         user1 = User.objects.get(pk=1)
         review = Review(owner=user1, title='Q1 review')
@@ -105,9 +171,78 @@ class ReviewTestCase(TestCase):
 
         response = self.client.get(f'/api/v1/feedbacks/', **headers)
         self.assertEqual(response.status_code, 200)
-        data = response.json()
+        data = response.json()['results']
         self.assertEqual(len(data), 2)
 
+    def testListReviewRequestFromValues(self):
+        user1 = User.objects.get(pk=1)
+        user2 = User.objects.get(pk=2)
+        for title in ('Q1 review', 'Q2 review'):
+            review = Review(owner=user1, title=title)
+            review.save()
+            request_ = ReviewRequest(review=review, owner=user2)
+            request_.save()
+        ReviewResponse(request=request_, score=70, memo='\u2028 ok').save()
+
+        # the same output as the serializer, answered or not
+        headers = get_auth_header(self.client, username='user1', password='1234')
+        response = self.client.get('/api/v1/feedbacks/', **headers)
+        queryset = ReviewRequest.objects.filter(owner=user2).order_by('pk')
+        self.assertEqual(
+            response.json()['results'],
+            json.loads(json.dumps(ReviewRequestRetriveSerializer(queryset, many=True).data)),
+        )
+
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        response = self.client.get(f'/api/v1/reviews/{review.pk}/:employees', **headers)
+        data = response.json()['results']
+        self.assertEqual([_['requested'] for _ in data if _['id'] == 2], [True])
+        view = response.renderer_context['view']
+        queryset = view.get_queryset().order_by('pk')
+        self.assertEqual(data, json.loads(json.dumps(ReviewUserSerializer(queryset, many=True).data)))
+
+    def testConditionalGetReviewRequest(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        user2 = User.objects.get(pk=2)
+        ReviewRequest(review=review, owner=user2).save()
+
+        headers = get_auth_header(self.client, username='user1', password='1234')
+
+        response = self.client.get('/api/v1/feedbacks/', **headers)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        # token + validators
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/feedbacks/', HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 304)
+
+        # an answer
+        response = self.client.patch('/api/v1/feedbacks/1/', {
+            'score': 80,
+            'memo': 'good',
+        }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/v1/feedbacks/', HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['reviewresponse']['score'], 80)
+        etag = response['ETag']
+
+        # a change of the review
+        review.title = 'Q2 review'
+        review.save()
+        response = self.client.get('/api/v1/feedbacks/', HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['review']['title'], 'Q2 review')
+        etag = response['ETag']
+
+        # a removed request
+        ReviewRequest.objects.all().delete()
+        response = self.client.get('/api/v1/feedbacks/', HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
     def testCreateReviewResponse(self):
         user1 = User.objects.get(pk=1)
         review = Review(owner=user1, title='Q1 review')
@@ -116,13 +251,168 @@ class ReviewTestCase(TestCase):
         review_request = ReviewRequest(review=review, owner=user2)
         review_request.save()
 
+        # user2 is pk 3, it is not their request
         headers = get_auth_header(self.client, username='user2', password='1234')
+        response = self.client.patch('/api/v1/feedbacks/1/', {
+            'score': 80,
+            'memo': 'nothing',
+        }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(ReviewResponse.objects.exists())
+
+        headers = get_auth_header(self.client, username=user2.username, password='1234')
+        response = self.client.patch('/api/v1/feedbacks/1/', {
+            'score': 80,
+            'memo': 'nothing',
+        }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+
+    def testUpdateReviewResponseTwice(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        review_request = ReviewRequest(review=review, owner=User.objects.get(pk=2))
+        review_request.save()
+
+        headers = get_auth_header(self.client, username='user1', password='1234')
 
         response = self.client.patch('/api/v1/feedbacks/1/', {
             'score': 80,
             'memo': 'nothing',
         }, content_type='application/json', **headers)
         self.assertEqual(response.status_code, 200)
+        response = self.client.patch('/api/v1/feedbacks/1/', {
+            'score': 60,
+        }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['reviewresponse']['score'], 60)
+        self.assertEqual(data['reviewresponse']['memo'], 'nothing')
+        self.assertEqual(data['review']['owner']['username'], 'user0')
+        self.assertEqual(ReviewResponse.objects.count(), 1)
+        review.refresh_from_db()
+        self.assertEqual((review.response_count, review.score), (1, 60))
+
+    def testCreateReviewResponseNeedsScore(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        review_request = ReviewRequest(review=review, owner=User.objects.get(pk=2))
+        review_request.save()
+
+        headers = get_auth_header(self.client, username='user1', password='1234')
+
+        response = self.client.patch('/api/v1/feedbacks/1/', {
+            'memo': 'nothing',
+        }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('score', response.json())
+
+    def testUpdateReviewResponseQueries(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        review_request = ReviewRequest(review=review, owner=User.objects.get(pk=2))
+        review_request.save()
+
+        headers = get_auth_header(self.client, username='user1', password='1234')
+
+        self.addCleanup(token_cache.clear)
+        with self.settings(TOKEN_CACHE_TTL=60):
+            self.client.get('/api/v1/employees/:self', **headers)
+            for score in (80, 60):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.patch('/api/v1/feedbacks/1/', {
+                        'score': score,
+                        'memo': 'nothing',
+                    }, content_type='application/json', **headers)
+                self.assertEqual(response.status_code, 200)
+                sql_list = [
+                    query['sql'] for query in context.captured_queries
+                    if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+                ]
+                # load + lock the answer + upsert + review aggregates
+                self.assertEqual(len(sql_list), 4, sql_list)
+
+    def testBatchCreateReviewResponse(self):
+        user1 = User.objects.get(pk=1)
+        review1 = Review(owner=user1, title='Q1 review')
+        review1.save()
+        review2 = Review(owner=user1, title='Q2 review')
+        review2.save()
+        user2 = User.objects.get(pk=2)
+        request1 = ReviewRequest(review=review1, owner=user2)
+        request1.save()
+        request2 = ReviewRequest(review=review2, owner=user2)
+        request2.save()
+        ReviewResponse(request=request2, score=10, memo='').save()
+        # someone else's feedback
+        request3 = ReviewRequest(review=review1, owner=User.objects.get(pk=3))
+        request3.save()
+
+        headers = get_auth_header(self.client, username='user1', password='1234')
+
+        response = self.client.post('/api/v1/feedbacks/:batch', {
+            'items': [
+                {'request_id': request1.pk, 'score': 80, 'memo': 'good'},
+                {'request_id': request2.pk, 'score': 40, 'memo': 'better'},
+                {'request_id': request3.pk, 'score': 40, 'memo': 'mine'},
+                {'request_id': request1.pk, 'score': 60, 'memo': 'again'},
+                {'request_id': 999, 'score': 140, 'memo': 'too high'},
+            ],
+        }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        result_list = response.json()['results']
+        self.assertEqual([r['status'] for r in result_list], [
+            'created',
+            'updated',
+            'not_found',
+            'invalid',
+            'invalid',
+        ])
+        self.assertIn('score', result_list[4]['errors'])
+
+        self.assertEqual(ReviewResponse.objects.get(request=request1).score, 80)
+        self.assertEqual(ReviewResponse.objects.get(request=request2).memo, 'better')
+        self.assertFalse(ReviewResponse.objects.filter(request=request3).exists())
+        review1.refresh_from_db()
+        self.assertEqual((review1.response_count, review1.score), (1, 80))
+        review2.refresh_from_db()
+        self.assertEqual((review2.response_count, review2.score), (1, 40))
+
+    def testBatchCreateReviewResponseConflict(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        user2 = User.objects.get(pk=2)
+        request1 = ReviewRequest(review=review, owner=user2)
+        request1.save()
+        review2 = Review(owner=user1, title='Q2 review')
+        review2.save()
+        request2 = ReviewRequest(review=review2, owner=user2)
+        request2.save()
+        ReviewResponse(request=request2, score=10, memo='').save()
+
+        headers = get_auth_header(self.client, username='user1', password='1234')
+
+        # as if request2 was answered right after we looked
+        with mock.patch('review.views._lock_responses', return_value={}):
+            response = self.client.post('/api/v1/feedbacks/:batch', {
+                'items': [
+                    {'request_id': request1.pk, 'score': 80, 'memo': 'good'},
+                    {'request_id': request2.pk, 'score': 40, 'memo': 'late'},
+                ],
+            }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'request_id': request1.pk, 'status': 'created'},
+            {'request_id': request2.pk, 'status': 'conflict'},
+        ])
+        self.assertEqual(ReviewResponse.objects.get(request=request2).memo, '')
+        review.refresh_from_db()
+        self.assertEqual((review.response_count, review.score_sum), (1, 80))
+        review2.refresh_from_db()
+        self.assertEqual((review2.response_count, review2.score_sum), (1, 10))
 
     def testListReviewUser(self):
         user1 = User.objects.get(pk=1)
@@ -142,8 +432,453 @@ class ReviewTestCase(TestCase):
 
         response = self.client.get('/api/v1/reviews/1/:employees', **headers)
         self.assertEqual(response.status_code, 200)
-        data = response.json()
+        data = response.json()['results']
         self.assertEqual(len(data), 9)
         dict_ = {u['id']: u for u in data}
         self.assertEqual(dict_[2]['requested'], True)
         self.assertEqual(dict_[10]['requested'], False)
+
+    def testListReviewUserByUsername(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        create_user(is_admin=False, username='vanilla', password='1234')
+        create_user(is_admin=False, username='valhalla', password='1234')
+        request_ = ReviewRequest(review=review, owner=User.objects.get(username='vanilla'))
+        request_.save()
+
+        headers = get_auth_header(self.client, username='admin', password='1234')
+
+        response = self.client.get('/api/v1/reviews/1/:employees', {
+            'username': 'va',
+        }, **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['results']
+        self.assertEqual([u['username'] for u in data], ['vanilla', 'valhalla'])
+        self.assertEqual([u['requested'] for u in data], [True, False])
+
+    def testListReviewUserQueries(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+
+        headers = get_auth_header(self.client, username='admin', password='1234')
+
+        # token + review + users
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/reviews/1/:employees', **headers)
+        self.assertEqual(response.status_code, 200)
+
+    def testReviewStatsFollowWrites(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        request_list = []
+        for pk in (2, 3, 4):
+            request_ = ReviewRequest(review=review, owner=User.objects.get(pk=pk))
+            request_.save()
+            request_list.append(request_)
+        ReviewResponse(request=request_list[0], score=80, memo='').save()
+        ReviewResponse(request=request_list[1], score=20, memo='').save()
+
+        review.refresh_from_db()
+        self.assertEqual(review.request_count, 3)
+        self.assertEqual(review.response_count, 2)
+        self.assertEqual(review.score, 50)
+
+        response_ = ReviewResponse.objects.get(request=request_list[1])
+        response_.score = 40
+        response_.save()
+        review.refresh_from_db()
+        self.assertEqual(review.score, 60)
+
+        request_list[0].delete()
+        review.refresh_from_db()
+        self.assertEqual(review.request_count, 2)
+        self.assertEqual(review.response_count, 1)
+        self.assertEqual(review.score, 40)
+
+    def testExportReviews(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1, review')
+        review.save()
+        request_ = ReviewRequest(review=review, owner=User.objects.get(pk=2))
+        request_.save()
+        ReviewResponse(request=request_, score=80, memo='good').save()
+
+        headers = get_auth_header(self.client, username='admin', password='1234')
+
+        response = self.client.get('/api/v1/reviews/:export', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines, [
+            'id,title,owner_id,owner_username,requested,responsed,score_sum,score',
+            '1,"Q1, review",1,user0,1,1,80,80.0',
+        ])
+
+        response = self.client.get('/api/v1/reviews/:export', {
+            'kind': 'responses',
+            'format': 'ndjson',
+        }, **headers)
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{
+            'review_id': 1,
+            'review_title': 'Q1, review',
+            'request_id': 1,
+            'reviewer_id': 2,
+            'reviewer_username': 'user1',
+            'score': 80,
+            'memo': 'good',
+        }])
+
+    def testExportNeedsAdmin(self):
+        headers = get_auth_header(self.client, username='user1', password='1234')
+        response = self.client.get('/api/v1/reviews/:export', **headers)
+        self.assertEqual(response.status_code, 403)
+
+    def testExportBadReview(self):
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        response = self.client.get('/api/v1/reviews/:export', {
+            'review': 'abc',
+        }, **headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content.decode('utf-8').splitlines(), [
+            'review',
+            'A valid integer is required.',
+        ])
+
+    def testExportBadKind(self):
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        response = self.client.get('/api/v1/reviews/:export', {
+            'kind': 'users',
+            'format': 'ndjson',
+        }, **headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {
+            'kind': '"users" is not a valid choice.',
+        })
+
+    def testExportAcceptJSON(self):
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        response = self.client.get('/api/v1/reviews/:export', HTTP_ACCEPT='application/json', **headers)
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(response.json(), {
+            'detail': 'Exports are available as csv or ndjson.',
+        })
+
+    def testReviewStats(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        for pk, score in zip(range(2, 7), (10, 20, 35, 95, 100)):
+            request_ = ReviewRequest(review=review, owner=User.objects.get(pk=pk))
+            request_.save()
+            ReviewResponse(request=request_, score=score, memo='').save()
+
+        headers = get_auth_header(self.client, username='admin', password='1234')
+
+        response = self.client.get('/api/v1/reviews/1/:stats', **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(data['mean'], 52)
+        self.assertEqual(data['median'], 35)
+        self.assertAlmostEqual(data['p10'], 14)
+        self.assertAlmostEqual(data['p90'], 98)
+        self.assertAlmostEqual(data['stddev'], statistics.pstdev([10, 20, 35, 95, 100]))
+        self.assertEqual(data['min'], 10)
+        self.assertEqual(data['max'], 100)
+        self.assertEqual([b['count'] for b in data['histogram']], [0, 1, 1, 1, 0, 0, 0, 0, 0, 2])
+        self.assertEqual(data['histogram'][-1], {'from': 90, 'to': 100, 'count': 2})
+
+        # cached
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/reviews/1/:stats', **headers)
+        self.assertEqual(response.json()['count'], 5)
+
+        # invalidated by a write, once it commits
+        response_ = ReviewResponse.objects.get(score=10)
+        response_.score = 50
+        with self.captureOnCommitCallbacks(execute=True):
+            response_.save()
+        response = self.client.get('/api/v1/reviews/1/:stats', **headers)
+        self.assertEqual(response.json()['min'], 20)
+
+    def testReviewStatsEmpty(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+
+        headers = get_auth_header(self.client, username='admin', password='1234')
+
+        response = self.client.get('/api/v1/reviews/1/:stats', **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 0)
+        self.assertIsNone(data['median'])
+        response = self.client.get('/api/v1/reviews/2/:stats', **headers)
+        self.assertEqual(response.status_code, 404)
+
+    def testReviewResponseCache(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        user2 = User.objects.get(pk=2)
+        request_ = ReviewRequest(review=review, owner=user2)
+        request_.save()
+
+        headers = get_auth_header(self.client, username='admin', password='1234')
+
+        response = self.client.get('/api/v1/reviews/1/', **headers)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        list_response = self.client.get('/api/v1/reviews/', **headers)
+        list_etag = list_response['ETag']
+
+        # token only
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/reviews/1/', **headers)
+        self.assertEqual(response.json()['responsed'], 0)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/reviews/1/', HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/reviews/', HTTP_IF_NONE_MATCH=list_etag, **headers)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/v1/reviews/', {
+            'user': 2,
+        }, HTTP_IF_NONE_MATCH=list_etag, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 0)
+
+        # invalidated by an answer, once it commits
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ReviewResponse(request=request_, score=80, memo='good').save()
+            # not before
+            response = self.client.get('/api/v1/reviews/1/', HTTP_IF_NONE_MATCH=etag, **headers)
+            self.assertEqual(response.status_code, 304)
+        self.assertTrue(callbacks)
+        response = self.client.get('/api/v1/reviews/1/', HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['responsed'], 1)
+        response = self.client.get('/api/v1/reviews/', HTTP_IF_NONE_MATCH=list_etag, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['score'], 80)
+
+        # invalidated by an update through the api
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/v1/reviews/1/', {
+                'title': 'Q2 review',
+            }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/v1/reviews/1/', **headers)
+        self.assertEqual(response.json()['title'], 'Q2 review')
+
+    def testAsyncViews(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        user2 = User.objects.get(pk=2)
+        ReviewRequest(review=review, owner=user2).save()
+
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        user_headers = get_auth_header(self.client, username='user1', password='1234')
+        self.addCleanup(token_cache.clear)
+        get = lambda path, **extra: async_request(self.async_client, 'get', path, **extra)
+        with self.settings(ROOT_URLCONF='server.urls_async', TOKEN_CACHE_TTL=60):
+            response = get('/api/v1/reviews/', **headers)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            etag = response['ETag']
+            response = get('/api/v1/reviews/1/', **headers)
+            self.assertEqual(response.json()['requested'], 1)
+
+            # cache hits and unchanged polls stay on the event loop
+            with self.assertNumQueries(0):
+                response = get('/api/v1/reviews/', **headers)
+            self.assertEqual(response.json(), data)
+            self.assertEqual(response['ETag'], etag)
+            with self.assertNumQueries(0):
+                response = get('/api/v1/reviews/', HTTP_IF_NONE_MATCH=etag, **headers)
+            self.assertEqual(response.status_code, 304)
+            with self.assertNumQueries(0):
+                response = get('/api/v1/reviews/1/', **headers)
+            self.assertEqual(response.json()['requested'], 1)
+
+            # employees may not read from the cache
+            response = get('/api/v1/reviews/', **user_headers)
+            self.assertEqual(response.status_code, 403)
+
+            # other methods go to the DRF views
+            with self.captureOnCommitCallbacks(execute=True):
+                response = async_request(self.async_client, 'post', '/api/v1/reviews/', {
+                    'owner': 1,
+                    'title': 'Q2 review',
+                }, content_type='application/json', **headers)
+            self.assertEqual(response.status_code, 201)
+            response = get('/api/v1/reviews/', **headers)
+            self.assertEqual(len(response.json()['results']), 2)
+
+            response = get('/api/v1/feedbacks/', **user_headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), 1)
+            self.assertIn('ETag', response)
+
+    def testDeactivateEmployeesCancelsPendingRequests(self):
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        request_list = []
+        for pk in (2, 3, 4):
+            request_ = ReviewRequest(review=review, owner=User.objects.get(pk=pk))
+            request_.save()
+            request_list.append(request_)
+        ReviewResponse(request=request_list[0], score=80, memo='').save()
+
+        response = self.client.get(f'/api/v1/reviews/{review.pk}/', **headers)
+        self.assertEqual(response.json()['requested'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/employees/:deactivate', {
+                'employees': [2, 3],
+                'cancel_pending_requests': True,
+            }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cancelled_requests'], 1)
+        # answered requests are kept
+        self.assertEqual(
+            list(ReviewRequest.objects.filter(review=review).order_by('owner').values_list('owner', flat=True)),
+            [2, 4],
+        )
+        review.refresh_from_db()
+        self.assertEqual(review.request_count, 2)
+        self.assertEqual(review.response_count, 1)
+
+        # the cached review follows
+        response = self.client.get(f'/api/v1/reviews/{review.pk}/', **headers)
+        self.assertEqual(response.json()['requested'], 2)
+
+    def testReviewRequestIsUnique(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        ReviewRequest(review=review, owner=User.objects.get(pk=2)).save()
+        with self.assertRaises(IntegrityError):
+            ReviewRequest(review=review, owner=User.objects.get(pk=2)).save()
+
+    def testRebuildReviewStats(self):
+        user1 = User.objects.get(pk=1)
+        review = Review(owner=user1, title='Q1 review')
+        review.save()
+        request_ = ReviewRequest(review=review, owner=User.objects.get(pk=2))
+        request_.save()
+        ReviewResponse(request=request_, score=70, memo='').save()
+        Review.objects.update(request_count=0, response_count=0, score_sum=0)
+
+        call_command('rebuildreviewstats', stdout=StringIO())
+
+        review.refresh_from_db()
+        self.assertEqual(review.request_count, 1)
+        self.assertEqual(review.response_count, 1)
+        self.assertEqual(review.score, 70)
+
+
+class ReviewQueryCountTestCase(TestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        for i in range(3):
+            create_user(is_admin=False, username=f'user{i}', password='1234')
+        create_user(is_admin=True, username='admin', password='1234')
+
+    def createReviews(self, count: int):
+        user_list = list(User.objects.filter(user_extra__is_admin=False))
+        Review.objects.bulk_create(
+            Review(owner=user_list[0], title=f'review {i}') for i in range(count)
+        )
+        review_list = list(Review.objects.order_by('pk'))
+        ReviewRequest.objects.bulk_create(
+            ReviewRequest(review=review, owner=user)
+            for review in review_list
+            for user in user_list[1:]
+        )
+        request_list = list(ReviewRequest.objects.order_by('pk'))
+        ReviewResponse.objects.bulk_create(
+            ReviewResponse(request=request_, score=60, memo='')
+            for request_ in request_list[::2]
+        )
+        # bulk_create skips the signals which maintain the stored aggregates
+        rebuild_review_stats()
+        return review_list
+
+    def assertListQueries(self, count: int):
+        self.createReviews(count)
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        # token + reviews
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/reviews/', **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['results']
+        self.assertEqual(len(data), min(count, 100))
+        self.assertEqual(data[0]['requested'], 2)
+        self.assertEqual(data[0]['responsed'], 1)
+        self.assertEqual(data[0]['score'], 60)
+
+    def assertRetrieveQueries(self, count: int):
+        review_list = self.createReviews(count)
+        headers = get_auth_header(self.client, username='admin', password='1234')
+        # token + review
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/v1/reviews/{review_list[-1].pk}/', **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['requested'], 2)
+
+    def testListReview100(self):
+        self.assertListQueries(100)
+
+    def testListReview1000(self):
+        self.assertListQueries(1000)
+
+    def testRetrieveReview100(self):
+        self.assertRetrieveQueries(100)
+
+    def testRetrieveReview1000(self):
+        self.assertRetrieveQueries(1000)
+
+    def assertListReviewRequestQueries(self, count: int):
+        user_list = list(User.objects.filter(user_extra__is_admin=False))
+        review_list = [
+            Review(owner=user_list[i % 2], title=f'review {i}') for i in range(count)
+        ]
+        Review.objects.bulk_create(review_list)
+        review_list = list(Review.objects.order_by('pk'))
+        ReviewRequest.objects.bulk_create(
+            ReviewRequest(review=review, owner=user_list[2]) for review in review_list
+        )
+        request_list = list(ReviewRequest.objects.order_by('pk'))
+        ReviewResponse.objects.bulk_create(
+            ReviewResponse(request=request_, score=60, memo='')
+            for request_ in request_list[::2]
+        )
+        headers = get_auth_header(self.client, username='user2', password='1234')
+        # token + validators + requests
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/feedbacks/', **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['results']
+        self.assertEqual(len(data), min(count, 100))
+        self.assertEqual(data[0]['review']['owner']['is_admin'], False)
+        self.assertEqual(data[0]['reviewresponse']['score'], 60)
+        self.assertIsNone(data[1]['reviewresponse'])
+
+    def testListReviewRequest10(self):
+        self.assertListReviewRequestQueries(10)
+
+    def testListReviewRequest200(self):
+        self.assertListReviewRequestQueries(200)
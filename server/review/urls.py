@@ -6,14 +6,22 @@ from . import views
 urlpatterns = [
     # create new reivew or list all reviews
     path('api/v1/reviews/', views.ReviewListCreateView.as_view()),
+    # export reviews or responses as CSV/NDJSON
+    path('api/v1/reviews/:export', views.ReviewExportView.as_view()),
     # retrive/update the review
     path('api/v1/reviews/<int:pk>/', views.ReviewRetrieveUpdateDestroyView.as_view()),
+    # score statistics of the review
+    path('api/v1/reviews/<int:pk>/:stats', views.ReviewStatsView.as_view()),
     # list possible employees to participate the review
     path('api/v1/reviews/<int:pk>/:employees', views.ReviewUserListView.as_view()),
     # batch send review invitations to employees
     path('api/v1/reviews/<int:pk>/:invite', views.ReviewRequestBatchCreateView.as_view()),
+    # progress of invitations sent in job mode
+    path('api/v1/invite-jobs/<int:pk>/', views.InviteJobRetrieveView.as_view()),
     # list feedbacks to answer
     path('api/v1/feedbacks/', views.ReviewRequestListView.as_view()),
     # answer the feedback
     path('api/v1/feedbacks/<int:pk>/', views.ReviewRequestUpdateView.as_view()),
+    # answer many feedbacks at once
+    path('api/v1/feedbacks/:batch', views.ReviewResponseBatchUpdateView.as_view()),
 ]
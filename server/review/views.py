@@ -1,30 +1,58 @@
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.db.models.functions import Coalesce, Greatest
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework.generics import (
     ListAPIView,
     ListCreateAPIView,
     RetrieveUpdateDestroyAPIView,
     CreateAPIView,
+    RetrieveAPIView,
     UpdateAPIView,
 )
 from rest_framework import status
+from rest_framework.exceptions import NotAcceptable, ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from account.permissions import IsAdmin, IsAuthenticated
-from account.serializers import UserUpdateSerializer
+from server.conditional import ConditionalGetMixin
+from server.renderers import FastJSONRenderer
+from server.values import ValuesListMixin
 
-from .models import Review, ReviewRequest, ReviewResponse
+from .models import (
+    InviteJob,
+    Review,
+    ReviewRequest,
+    ReviewResponse,
+    adjust_review_stats,
+    average_score,
+    invite_participants,
+    upsert_review_response,
+)
+from .cache import ReviewCacheMixin
+from .renderers import CSVRenderer, NDJSONRenderer
+from .stats import get_review_stats
 from .serializers import (
+    InviteJobSerializer,
     ReviewSerializer,
+    ReviewUserSerializer,
     ReviewRequestBatchCreateSerializer,
-    ReviewRequestListSerializer,
     ReviewRequestRetriveSerializer,
     ReviewRequestUpdateSerializer,
+    ReviewResponseBatchItemSerializer,
+    ReviewResponseBatchSerializer,
     ReviewResponseSerializer,
+    review_request_values,
+    review_user_values,
 )
 
 
-class ReviewListCreateView(ListCreateAPIView):
+class ReviewListCreateView(ReviewCacheMixin, ListCreateAPIView):
     permission_classes = [IsAdmin]
     serializer_class = ReviewSerializer
 
@@ -36,11 +64,28 @@ class ReviewListCreateView(ListCreateAPIView):
         return queryset
 
 
-class ReviewRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
+class ReviewRetrieveUpdateDestroyView(ReviewCacheMixin, RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAdmin]
-    queryset = Review.objects.all()
     serializer_class = ReviewSerializer
 
+    def get_queryset(self):
+        return Review.objects.all()
+
+
+class ReviewStatsView(APIView):
+    """
+    Score statistics of a review: mean, median, p10/p90, standard deviation
+    and a histogram of 10-point buckets.
+    """
+
+    permission_classes = [IsAdmin]
+    # cached under the review version, see ReviewCacheMixin
+    read_from_replica = False
+
+    def get(self, request, *args, **kwargs):
+        get_object_or_404(Review.objects.only('pk'), pk=self.kwargs['pk'])
+        return Response(get_review_stats(self.kwargs['pk']))
+
 
 class ReviewRequestBatchCreateView(CreateAPIView):
     permission_classes = [IsAdmin]
@@ -52,66 +97,377 @@ class ReviewRequestBatchCreateView(CreateAPIView):
         serializer.is_valid(raise_exception=True)
         data = serializer.data
 
-        review = Review.objects.get(pk=self.kwargs['pk'])
-        for user_id in data['participants']:
-            user = User.objects.get(pk=user_id)
-            review_request = ReviewRequest(review=review, owner=user)
-            review_request.save()
+        review = get_object_or_404(Review, pk=self.kwargs['pk'])
+        if data['mode'] == 'job':
+            participants = list(dict.fromkeys(data['participants']))
+            job = InviteJob.objects.create(
+                review=review,
+                participants=participants,
+                total=len(participants),
+            )
+            return Response({
+                'id': job.id,
+                'status': job.status,
+            }, status=status.HTTP_202_ACCEPTED, headers={
+                'Location': f'/api/v1/invite-jobs/{job.id}/',
+            })
+
+        created, skipped, invalid = invite_participants(
+            review,
+            data['participants'],
+            batch_size=settings.REVIEW_INVITE_BATCH_SIZE,
+        )
+        return Response({
+            'created': created,
+            'skipped': skipped,
+            'invalid': invalid,
+        }, status=status.HTTP_201_CREATED)
 
-        review_request_list = ReviewRequest.objects.filter(review=review)
-        serializer = ReviewRequestListSerializer(review_request_list, many=True)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+class InviteJobRetrieveView(RetrieveAPIView):
+    permission_classes = [IsAdmin]
+    serializer_class = InviteJobSerializer
+    queryset = InviteJob.objects.defer('participants')
 
 
-class ReviewRequestListView(ListAPIView):
+class ReviewRequestListView(ConditionalGetMixin, ValuesListMixin, ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ReviewRequestRetriveSerializer
+    values_mapping = review_request_values
+    # every row the serializer renders
+    last_modified_field = Greatest(
+        'updated_at',
+        Coalesce('reviewresponse__updated_at', 'updated_at'),
+        'review__updated_at',
+        'review__owner__user_extra__updated_at',
+        'owner__user_extra__updated_at',
+    )
 
     def get_queryset(self):
-        queryset = ReviewRequest.objects.filter(owner=self.request.user)
+        queryset = (ReviewRequest.objects
+            .filter(owner=self.request.user)
+            .select_related(
+                'review__owner__user_extra',
+                'owner__user_extra',
+                'reviewresponse',
+            )
+        )
         return queryset
 
 
 class ReviewRequestUpdateView(UpdateAPIView):
     permission_classes = [IsAuthenticated]
 
+    @transaction.atomic
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
-        feedback = ReviewRequest.objects.get(pk=self.kwargs['pk'])
+        # load everything the response needs, with the answer locked so
+        # partial updates and the score delta start from the current row
+        feedback = get_object_or_404(
+            ReviewRequest.objects.select_related(
+                'review__owner__user_extra',
+                'owner__user_extra',
+            ).prefetch_related(Prefetch(
+                'reviewresponse',
+                queryset=ReviewResponse.objects.select_for_update(),
+            )),
+            # only the feedbacks of the current user, as in the batch view
+            pk=self.kwargs['pk'],
+            owner=request.user,
+        )
 
         # if we already have a response, use the existing one
         try:
-            instance = feedback.reviewrequest
-        except Exception:
+            instance = feedback.reviewresponse
+        except ReviewResponse.DoesNotExist:
             instance = None
         serializer = ReviewResponseSerializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
+        self.perform_update(serializer, feedback)
 
-        feedback.refresh_from_db()
         serializer = ReviewRequestRetriveSerializer(feedback)
         return Response(serializer.data)
 
-    def perform_update(self, serializer):
-        serializer.save(request_id=self.kwargs['pk'])
+    def perform_update(self, serializer, feedback):
+        data = serializer.validated_data
+        instance = serializer.instance
+        if instance is None:
+            missing = [name for name in ('score', 'memo') if name not in data]
+            if missing:
+                raise ValidationError({
+                    name: ['This field is required.'] for name in missing
+                })
+            score = data['score']
+            memo = data['memo']
+        else:
+            score = data.get('score', instance.score)
+            memo = data.get('memo', instance.memo)
+        upsert_review_response(feedback, score, memo)
 
     def partial_update(self, request, *args, **kwargs):
         kwargs['partial'] = True
         return self.update(request, *args, **kwargs)
 
 
-class ReviewUserListView(ListAPIView):
+class ReviewResponseBatchUpdateView(CreateAPIView):
+    """
+    Answer many feedbacks in one call.
+
+    Accepts {"items": [{"request_id", "score", "memo"}, ...]} and reports
+    created/updated/not_found/invalid/conflict for every item. `conflict`
+    means the feedback was answered by another request in the meantime.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = ReviewResponseBatchSerializer
+
+    @transaction.atomic
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        item_list = serializer.validated_data['items']
+
+        result_list = [None] * len(item_list)
+        answer_dict = {}
+        for index, item in enumerate(item_list):
+            item_serializer = ReviewResponseBatchItemSerializer(data=item)
+            if not item_serializer.is_valid():
+                result_list[index] = {
+                    'request_id': item.get('request_id', None),
+                    'status': 'invalid',
+                    'errors': item_serializer.errors,
+                }
+                continue
+            data = item_serializer.validated_data
+            if data['request_id'] in answer_dict:
+                result_list[index] = {
+                    'request_id': data['request_id'],
+                    'status': 'invalid',
+                    'errors': {'request_id': ['Duplicated in this batch.']},
+                }
+                continue
+            answer_dict[data['request_id']] = (index, data)
+
+        # only the feedbacks of the current user
+        feedback_list = ReviewRequest.objects.filter(
+            pk__in=list(answer_dict.keys()),
+            owner=request.user,
+        )
+        feedback_dict = {feedback.pk: feedback for feedback in feedback_list}
+        # locked, so the deltas below are computed from the current scores
+        response_dict = _lock_responses(feedback_dict.keys())
+
+        create_list = []
+        update_list = []
+        delta_dict = {}
+        for request_id, (index, data) in answer_dict.items():
+            feedback = feedback_dict.get(request_id, None)
+            if feedback is None:
+                result_list[index] = {
+                    'request_id': request_id,
+                    'status': 'not_found',
+                }
+                continue
+            response_ = response_dict.get(request_id, None)
+            if response_ is None:
+                create_list.append((index, ReviewResponse(
+                    request=feedback,
+                    score=data['score'],
+                    memo=data['memo'],
+                )))
+                continue
+            delta = delta_dict.setdefault(feedback.review_id, {
+                'response_count': 0,
+                'score_sum': 0,
+            })
+            delta['score_sum'] += data['score'] - response_.score
+            response_.score = data['score']
+            response_.memo = data['memo']
+            update_list.append(response_)
+            result_list[index] = {
+                'request_id': request_id,
+                'status': 'updated',
+            }
+
+        for index, response_ in _create_responses(create_list):
+            delta = delta_dict.setdefault(response_.request.review_id, {
+                'response_count': 0,
+                'score_sum': 0,
+            })
+            delta['response_count'] += 1
+            delta['score_sum'] += response_.score
+            result_list[index] = {
+                'request_id': response_.request_id,
+                'status': 'created',
+            }
+        for index, response_ in create_list:
+            if result_list[index] is None:
+                # answered by somebody else since we looked
+                result_list[index] = {
+                    'request_id': response_.request_id,
+                    'status': 'conflict',
+                }
+
+        # bulk_update skips auto_now, so touch the rows ourselves
+        now = timezone.now()
+        for response_ in update_list:
+            response_.updated_at = now
+        ReviewResponse.objects.bulk_update(update_list, ['score', 'memo', 'updated_at'])
+        # bulk writes do not send signals, so maintain the aggregates here
+        adjust_review_stats(delta_dict)
+        return Response({
+            'results': result_list,
+        })
+
+
+def _lock_responses(request_id_list):
+    return {
+        response_.request_id: response_
+        for response_ in (ReviewResponse.objects
+            .select_for_update()
+            .filter(request_id__in=list(request_id_list))
+        )
+    }
+
+
+def _create_responses(index_response_list):
+    """
+    Insert the responses, and returns (index, response) of those inserted.
+
+    A request answered concurrently breaks the unique request, then every
+    response is inserted on its own so only the conflicting ones are left out.
+    """
+    response_list = [response_ for _, response_ in index_response_list]
+    try:
+        with transaction.atomic():
+            ReviewResponse.objects.bulk_create(response_list)
+    except IntegrityError:
+        pass
+    else:
+        return index_response_list
+
+    rv = []
+    for index, response_ in index_response_list:
+        try:
+            with transaction.atomic():
+                ReviewResponse.objects.bulk_create([response_])
+        except IntegrityError:
+            continue
+        rv.append((index, response_))
+    return rv
+
+
+class ReviewUserListView(ValuesListMixin, ListAPIView):
     permission_classes = [IsAdmin]
+    serializer_class = ReviewUserSerializer
+    values_mapping = review_user_values
 
-    def list(self, request, *args, **kwargs):
-        review = Review.objects.get(pk=self.kwargs['pk'])
-        request_list = ReviewRequest.objects.filter(review=review)
-        user_set = set(request_list.values_list('owner_id', flat=True))
-        candidate_list = User.objects.filter(user_extra__is_admin=False, user_extra__is_active=True)
-        serializer = UserUpdateSerializer(candidate_list, many=True)
-        data = serializer.data
-        # should not self review
-        data = [user for user in data if user['id'] != review.owner_id]
-        for user in data:
-            user['requested'] = user['id'] in user_set
-        return Response(data)
+    def get_queryset(self):
+        review = get_object_or_404(Review.objects.only('owner_id'), pk=self.kwargs['pk'])
+        requested = ReviewRequest.objects.filter(review=review, owner=OuterRef('pk'))
+        queryset = (User.objects
+            .filter(user_extra__is_admin=False, user_extra__is_active=True)
+            # should not self review
+            .exclude(pk=review.owner_id)
+            .select_related('user_extra')
+            .annotate(requested=Exists(requested))
+        )
+        username = self.request.query_params.get('username', None)
+        if username:
+            queryset = queryset.filter(username__startswith=username)
+        return queryset
+
+
+class ReviewExportView(APIView):
+    """
+    Stream all reviews or all responses as CSV or NDJSON.
+
+    Query parameters:
+    kind -- `reviews` (default) or `responses`
+    review -- only export this review
+    format -- `csv` (default) or `ndjson`, or use the Accept header
+
+    Errors are rendered in the requested format, JSON is only accepted for
+    them.
+    """
+
+    permission_classes = [IsAdmin]
+    renderer_classes = [CSVRenderer, NDJSONRenderer, FastJSONRenderer]
+
+    def get(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, (CSVRenderer, NDJSONRenderer)):
+            raise NotAcceptable('Exports are available as csv or ndjson.')
+        kind = request.query_params.get('kind', 'reviews')
+        if kind not in ('reviews', 'responses'):
+            raise ValidationError({
+                'kind': [f'"{kind}" is not a valid choice.'],
+            })
+        review_id = request.query_params.get('review', None)
+        if review_id is not None:
+            try:
+                review_id = int(review_id)
+            except ValueError:
+                raise ValidationError({
+                    'review': ['A valid integer is required.'],
+                })
+        if kind == 'responses':
+            header = [
+                'review_id',
+                'review_title',
+                'request_id',
+                'reviewer_id',
+                'reviewer_username',
+                'score',
+                'memo',
+            ]
+            queryset = ReviewResponse.objects.values_list(
+                'request__review_id',
+                'request__review__title',
+                'request_id',
+                'request__owner_id',
+                'request__owner__username',
+                'score',
+                'memo',
+            )
+            if review_id is not None:
+                queryset = queryset.filter(request__review_id=review_id)
+        else:
+            header = [
+                'id',
+                'title',
+                'owner_id',
+                'owner_username',
+                'requested',
+                'responsed',
+                'score_sum',
+                'score',
+            ]
+            queryset = Review.objects.values_list(
+                'id',
+                'title',
+                'owner_id',
+                'owner__username',
+                'request_count',
+                'response_count',
+                'score_sum',
+            )
+            if review_id is not None:
+                queryset = queryset.filter(pk=review_id)
+
+        rows = queryset.order_by('pk').iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        if kind == 'reviews':
+            rows = _with_score(rows)
+        response = StreamingHttpResponse(
+            renderer.stream(header, rows),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{kind}.{renderer.format}"'
+        return response
+
+
+def _with_score(rows):
+    # the average as ReviewSerializer shows it, after response_count and score_sum
+    for row in rows:
+        response_count, score_sum = row[-2:]
+        yield (*row, average_score(score_sum, response_count))
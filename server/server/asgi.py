@@ -9,8 +9,25 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 
-application = get_asgi_application()
+
+class AsyncURLConfHandler(ASGIHandler):
+    """
+    Route the requests of this entry point with server.urls_async, which
+    serves the hot read endpoints with coroutine views.
+    """
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = 'server.urls_async'
+        return request, error_response
+
+
+# what get_asgi_application() does, with our handler
+django.setup(set_prefix=False)
+application = AsyncURLConfHandler()
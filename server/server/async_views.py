@@ -0,0 +1,106 @@
+"""
+Coroutine views for the ASGI entry point, see server.urls_async.
+
+Django 3.2 has no async ORM and DRF views are synchronous. A view served
+with `as_async_view` first tries its `fast_path`, which may only use
+in-process state such as the token cache and a local memory cache, so it
+answers without leaving the event loop. Otherwise the whole DRF view, i.e.
+authentication, queries, serialization and rendering, runs in a single
+sync_to_async handoff.
+
+The token cache is off by default, set TOKEN_CACHE_TTL to use the fast
+paths. Until then every request takes the handoff.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.authentication import get_authorization_header
+
+from account.authentication import TokenAuthentication, token_cache
+
+from .renderers import FastJSONRenderer
+
+
+def as_async_view(view_class, fast_path=None, **initkwargs):
+    """
+    Wrap a DRF view class into a coroutine view.
+
+    `fast_path(request, *args, **kwargs)` is called on the event loop for GET
+    requests. It returns a response, or None to fall back to the DRF view.
+    """
+    view = view_class.as_view(**initkwargs)
+
+    def run_view(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        render = getattr(response, 'render', None)
+        if render is None:
+            return response
+        # a rendered plain response, or Django renders it in another handoff
+        render()
+        rv = HttpResponse(response.content, status=response.status_code)
+        for name, value in response.items():
+            rv[name] = value
+        rv.cookies = response.cookies
+        return rv
+
+    run_view = sync_to_async(run_view)
+
+    async def async_view(request, *args, **kwargs):
+        if fast_path is not None and request.method == 'GET':
+            response = fast_path(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await run_view(request, *args, **kwargs)
+
+    async_view.view_class = view_class
+    async_view.csrf_exempt = True
+    return async_view
+
+
+def authenticate_from_cache(request, view_class):
+    """
+    Set and return request.user if the token is in the token cache and the
+    permissions of `view_class` pass, else return None.
+    """
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != TokenAuthentication.keyword.lower().encode():
+        return None
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        return None
+    rv = token_cache.get(key)
+    if rv is None:
+        return None
+    request.user, request.auth = rv
+    for permission_class in view_class.permission_classes:
+        if not permission_class().has_permission(request, None):
+            return None
+    return request.user
+
+
+def is_cache_local():
+    # other backends do I/O, which must not block the event loop
+    return isinstance(caches['default'], LocMemCache)
+
+
+def render_json(data, status_code=status.HTTP_200_OK, headers=None):
+    response = HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status_code,
+        content_type='application/json',
+    )
+    response['Vary'] = 'Accept'
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def render_not_modified(headers):
+    response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    for name, value in headers.items():
+        response[name] = value
+    return response
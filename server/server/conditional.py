@@ -0,0 +1,83 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin(object):
+    """
+    ETag/Last-Modified for list/retrieve of generic views.
+
+    The validators come from one MAX(updated_at)/COUNT query over the same
+    queryset the view would serialize, so an unchanged poll is answered with
+    304 without loading or serializing any row. COUNT catches deletions,
+    which do not move MAX(updated_at).
+
+    `last_modified_field` can be any expression, e.g. Greatest() over the
+    timestamps of the related rows the serializer renders.
+    """
+
+    last_modified_field = 'updated_at'
+
+    def get_last_modified_field(self):
+        return self.last_modified_field
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._get_conditional_response(
+            request,
+            queryset,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(**{
+            self.lookup_field: self.kwargs[lookup_url_kwarg],
+        })
+        return self._get_conditional_response(
+            request,
+            queryset,
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs),
+            # a single row can not be deleted without 404, the date is enough
+            allow_modified_since=True,
+        )
+
+    def _get_conditional_response(self, request, queryset, get_response, allow_modified_since=False):
+        state = queryset.order_by().aggregate(
+            last_modified=Max(self.get_last_modified_field()),
+            count=Count('pk'),
+        )
+        last_modified = state['last_modified']
+        if last_modified is None:
+            return get_response()
+
+        query = '&'.join(f'{k}={v}' for k, v in sorted(request.query_params.items()))
+        key = f'{request.path}:{request.user.pk}:{query}:{last_modified.isoformat()}:{state["count"]}'
+        etag = '"{0}"'.format(hashlib.md5(key.encode('utf-8')).hexdigest())
+        # HTTP dates have a resolution of one second
+        timestamp = int(last_modified.timestamp())
+        headers = {
+            'ETag': etag,
+            'Last-Modified': http_date(timestamp),
+        }
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            if_none_match = parse_etags(if_none_match)
+            if etag in if_none_match or '*' in if_none_match:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        elif allow_modified_since:
+            if_modified_since = parse_http_date_safe(
+                request.headers.get('If-Modified-Since', ''),
+            )
+            if if_modified_since is not None and timestamp <= if_modified_since:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response = get_response()
+        if response.status_code == status.HTTP_200_OK:
+            for name, value in headers.items():
+                response[name] = value
+        return response
@@ -0,0 +1,206 @@
+"""
+Opt-in per-request SQL and timing instrumentation.
+
+Enable with the INSTRUMENTATION_ENABLED setting. Every request then gets a
+`Server-Timing` header and a structured log line on the
+`server.instrumentation` logger, and is aggregated per endpoint for
+`EndpointStatsView`.
+
+Streamed responses, e.g. the exports, produce their body after the
+middleware has returned, so their timings cover the view only and leave
+out generating the body. Their log lines are marked with `streaming`.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from account.permissions import IsAdmin
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics(object):
+    """
+    Execute wrapper which records every SQL statement of one request.
+    """
+
+    def __init__(self):
+        self.sql_counter = Counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.begin = time.perf_counter()
+        self.view_begin = None
+        self.view_sql_time = 0.0
+        self.view_end = None
+        self.render_end = None
+
+    def __call__(self, execute, sql, params, many, context):
+        begin = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - begin
+            self.query_count += 1
+            self.sql_counter[sql] += 1
+
+    @property
+    def duplicated_count(self):
+        return sum(count - 1 for count in self.sql_counter.values())
+
+    def timings(self, end: float):
+        """
+        Returns a dict of milliseconds.
+
+        `view` is the non-SQL view time, i.e. the time spent in the view
+        minus its SQL time. For our API views it is mostly serializers, but it
+        is not measured around them, permissions, filters and the like count
+        as well. `render` is measured around rendering the response.
+        """
+        rv = {
+            'total': (end - self.begin) * 1000,
+            'db': self.sql_time * 1000,
+        }
+        if self.view_begin is not None and self.view_end is not None:
+            view_time = self.view_end - self.view_begin
+            rv['view'] = max(0.0, view_time - self.view_sql_time) * 1000
+        if self.view_end is not None and self.render_end is not None:
+            rv['render'] = (self.render_end - self.view_end) * 1000
+        return rv
+
+
+class EndpointStats(object):
+    """
+    Thread-safe per-endpoint aggregates of this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stat_dict = {}
+
+    def add(self, endpoint: str, query_count: int, duplicated_count: int, timings: dict):
+        with self._lock:
+            stat = self._stat_dict.setdefault(endpoint, {
+                'endpoint': endpoint,
+                'requests': 0,
+                'queries': 0,
+                'duplicated_queries': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'db_ms': 0.0,
+                'view_ms': 0.0,
+                'render_ms': 0.0,
+            })
+            stat['requests'] += 1
+            stat['queries'] += query_count
+            stat['duplicated_queries'] += duplicated_count
+            stat['max_ms'] = max(stat['max_ms'], timings['total'])
+            for name, value in timings.items():
+                stat[f'{name}_ms'] += value
+
+    def snapshot(self):
+        with self._lock:
+            rv = [dict(stat) for stat in self._stat_dict.values()]
+        for stat in rv:
+            count = stat['requests']
+            stat['avg_ms'] = stat['total_ms'] / count
+            stat['avg_queries'] = stat['queries'] / count
+        # hottest endpoints first
+        rv.sort(key=lambda _: _['total_ms'], reverse=True)
+        return rv
+
+    def clear(self):
+        with self._lock:
+            self._stat_dict.clear()
+
+
+endpoint_stats = EndpointStats()
+
+
+class InstrumentationMiddleware(object):
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        end = time.perf_counter()
+        if metrics.view_begin is not None and metrics.view_end is None:
+            # not a TemplateResponse, there is no render step
+            metrics.view_end = end
+            metrics.view_sql_time += metrics.sql_time
+
+        timings = metrics.timings(end)
+        response['Server-Timing'] = ', '.join(_server_timing(metrics, timings))
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        route = resolver_match.route if resolver_match else 'unresolved'
+        endpoint = f'{request.method} {route}'
+        endpoint_stats.add(endpoint, metrics.query_count, metrics.duplicated_count, timings)
+        logger.info(json.dumps({
+            'endpoint': endpoint,
+            'path': request.path,
+            'status': response.status_code,
+            'streaming': response.streaming,
+            'queries': metrics.query_count,
+            'duplicated_queries': metrics.duplicated_count,
+            **{f'{name}_ms': round(value, 3) for name, value in timings.items()},
+        }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = request.metrics
+        metrics.view_begin = time.perf_counter()
+        metrics.view_sql_time = -metrics.sql_time
+
+    def process_template_response(self, request, response):
+        # called after the view, right before rendering
+        metrics = request.metrics
+        metrics.view_end = time.perf_counter()
+        metrics.view_sql_time += metrics.sql_time
+
+        def on_rendered(response):
+            metrics.render_end = time.perf_counter()
+
+        response.add_post_render_callback(on_rendered)
+        return response
+
+
+def _server_timing(metrics: RequestMetrics, timings: dict):
+    yield (
+        f'db;dur={timings["db"]:.3f};'
+        f'desc="{metrics.query_count} queries, {metrics.duplicated_count} duplicated"'
+    )
+    if 'view' in timings:
+        yield f'view;dur={timings["view"]:.3f};desc="non-SQL view time"'
+    for name in ('render', 'total'):
+        if name in timings:
+            yield f'{name};dur={timings[name]:.3f}'
+
+
+class EndpointStatsView(APIView):
+    """
+    Per-endpoint aggregates since the process started, slowest first.
+    """
+
+    permission_classes = [IsAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response(endpoint_stats.snapshot())
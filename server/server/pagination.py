@@ -0,0 +1,18 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Paginate on the primary key with an opaque cursor.
+
+    Every page is a `WHERE pk > cursor ORDER BY pk LIMIT size` query, so the
+    cost does not grow with how deep the client is in the result set.
+    """
+
+    ordering = 'pk'
+    page_size_query_param = 'page_size'
+
+    @property
+    def max_page_size(self):
+        return settings.MAX_PAGE_SIZE
@@ -0,0 +1,48 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer which encodes with orjson when it is installed.
+
+    Datetimes, decimals and other types orjson leaves to us go through the
+    JSONEncoder of DRF, so they come out as with JSONRenderer in compact mode.
+    Indented output, e.g. for the browsable API, and anything orjson refuses
+    fall back to JSONRenderer. Floats differ: orjson writes exponents
+    without a sign, e.g. 1e16 for 1e+16, and NaN and infinities as null,
+    where JSONRenderer raises ValueError.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not self._can_use_orjson(data, accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=_encoder.default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # escaped by JSONRenderer as well, they end lines in JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+    def _can_use_orjson(self, data, accepted_media_type, renderer_context):
+        if orjson is None or data is None:
+            return False
+        # orjson only writes compact UTF-8
+        if self.ensure_ascii or not self.compact:
+            return False
+        return not self.get_indent(accepted_media_type, renderer_context or {})
@@ -0,0 +1,95 @@
+"""
+Read replica routing.
+
+`ReplicaRoutingMiddleware` sends the reads of safe requests on the views of
+DATABASE_REPLICA_APPS to one of the DATABASE_REPLICAS aliases, through
+`ReplicaRouter`. Everything else reads from and writes to the primary.
+
+A client which has just written is pinned to the primary for
+DATABASE_REPLICA_PIN_SECONDS, so it reads its own writes despite the
+replication lag. Clients are told apart by their Authorization header and
+the pins live in the default cache, which must be shared between processes.
+"""
+
+import contextvars
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# the alias reads go to, None for the primary
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+def get_read_alias():
+    return _read_alias.get()
+
+
+class ReplicaRouter(object):
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None:
+            return DEFAULT_DB_ALIAS
+        # authentication must see new tokens and deactivated users at once
+        if model._meta.app_label == 'authtoken':
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # the rest of a request which writes reads its own writes
+        _read_alias.set(None)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # every alias holds a copy of the same database
+        return True
+
+
+class ReplicaRoutingMiddleware(object):
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _read_alias.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        if request.method not in SAFE_METHODS:
+            key = _get_pin_key(request)
+            if key is not None:
+                cache.set(key, True, settings.DATABASE_REPLICA_PIN_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS:
+            return None
+        view_class = getattr(view_func, 'view_class', None)
+        app_label = (view_class or view_func).__module__.split('.', 1)[0]
+        if app_label not in settings.DATABASE_REPLICA_APPS:
+            return None
+        if not getattr(view_class, 'read_from_replica', True):
+            return None
+        key = _get_pin_key(request)
+        if key is not None and cache.get(key):
+            return None
+        _read_alias.set(random.choice(settings.DATABASE_REPLICAS))
+        return None
+
+
+def _get_pin_key(request):
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return None
+    digest = hashlib.md5(authorization.encode('utf-8')).hexdigest()
+    return f'replica-pin:{digest}'
@@ -0,0 +1,18 @@
+"""
+Settings for the test runner, e.g.
+
+    ./manage.py test --settings server.settings_test
+"""
+
+from .settings import *
+
+
+# a separate database standing in for a replica, it is not in
+# DATABASE_REPLICAS, only the replica tests route to it
+DATABASES = {
+    **DATABASES,
+    'replica': {
+        'ENGINE': 'server.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
@@ -0,0 +1,21 @@
+from asgiref.sync import async_to_sync
+
+
+def async_request(client, method: str, path: str, data=None, **extra):
+    """
+    Send a request with an AsyncClient from a synchronous test.
+
+    `extra` takes HTTP_* keys like Client does, the AsyncClient of Django 3.2
+    wants plain header names instead.
+    """
+    header_dict = {
+        key[5:].replace('_', '-') if key.startswith('HTTP_') else key: value
+        for key, value in extra.items()
+    }
+
+    async def send():
+        if data is None:
+            return await getattr(client, method)(path, **header_dict)
+        return await getattr(client, method)(path, data, **header_dict)
+
+    return async_to_sync(send)()
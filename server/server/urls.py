@@ -17,8 +17,12 @@ from django.contrib import admin
 from django.urls import path
 from django.urls.conf import include
 
+from .instrumentation import EndpointStatsView
+
 urlpatterns = [
     path('', include('account.urls')),
     path('', include('review.urls')),
+    # per-endpoint metrics, when INSTRUMENTATION_ENABLED
+    path('api/v1/stats/endpoints/', EndpointStatsView.as_view()),
     path('admin/', admin.site.urls),
 ]
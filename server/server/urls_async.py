@@ -0,0 +1,20 @@
+"""
+URL configuration of the ASGI entry point.
+
+The hot read endpoints are served by coroutine views, which answer from
+in-process caches on the event loop when they can. Everything else is
+the same as server.urls.
+"""
+from django.urls import path
+from django.urls.conf import include
+
+from account import async_views as account_views
+from review import async_views as review_views
+
+urlpatterns = [
+    path('api/v1/employees/:self', account_views.employee_self),
+    path('api/v1/reviews/', review_views.review_list),
+    path('api/v1/reviews/<int:pk>/', review_views.review_detail),
+    path('api/v1/feedbacks/', review_views.feedback_list),
+    path('', include('server.urls')),
+]
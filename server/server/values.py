@@ -0,0 +1,73 @@
+from operator import itemgetter
+
+from rest_framework.response import Response
+
+
+class ValuesMapping(object):
+    """
+    Build nested output dicts from `.values()` rows, for read-only lists.
+
+    `fields` maps output keys to lookups, or to another ValuesMapping for
+    nested objects, in the order of the serializer it stands in for. A
+    nested mapping is None when its `null_if` lookup is NULL, e.g. a missing
+    reverse one-to-one.
+
+    The getters are compiled once, so turning a row into a dict is a dict
+    comprehension over itemgetters instead of the per-field machinery of a
+    ModelSerializer.
+    """
+
+    def __init__(self, fields: dict, null_if: str = None):
+        self.fields = fields
+        self.null_if = null_if
+
+        lookup_list = []
+        self._step_list = []
+        for key, value in fields.items():
+            if isinstance(value, ValuesMapping):
+                lookup_list.extend(value.lookups)
+                self._step_list.append((key, value))
+            else:
+                lookup_list.append(value)
+                self._step_list.append((key, itemgetter(value)))
+        if null_if is not None:
+            lookup_list.append(null_if)
+            self._is_null = itemgetter(null_if)
+        else:
+            self._is_null = None
+        # what to pass to .values()
+        self.lookups = list(dict.fromkeys(lookup_list))
+
+    def __call__(self, row: dict):
+        if self._is_null is not None and self._is_null(row) is None:
+            return None
+        return {key: get(row) for key, get in self._step_list}
+
+    def with_prefix(self, prefix: str):
+        """
+        The same mapping for rows of a related model, e.g. `owner__`.
+        """
+        return ValuesMapping({
+            key: value.with_prefix(prefix) if isinstance(value, ValuesMapping) else prefix + value
+            for key, value in self.fields.items()
+        }, null_if=None if self.null_if is None else prefix + self.null_if)
+
+
+class ValuesListMixin(object):
+    """
+    list() of generic views from `.values()` rows and `values_mapping`,
+    skipping model instances and the serializer. The output must be the
+    same as what `serializer_class` renders, writes still use the latter.
+    """
+
+    values_mapping = None
+
+    def list(self, request, *args, **kwargs):
+        mapping = self.values_mapping
+        # the keyset pagination reads `pk` from the rows
+        queryset = self.filter_queryset(self.get_queryset()).values('pk', *mapping.lookups)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response([mapping(row) for row in page])
+        return Response([mapping(row) for row in queryset])